@@ -1,15 +1,77 @@
 import os
 import re
+import sys
+import json
+import time
+import random
+import signal
+import asyncio
 import logging
-from datetime import datetime
-from typing import Dict, Optional
+import threading
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import MemoryHandler, TimedRotatingFileHandler
+from typing import Dict, List, Optional, Sequence, Set, Tuple
 from dotenv import load_dotenv
 import discord
 from discord.ext import commands
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from game_session import GameSession
+from sheets_api import MAX_ATTEMPTS, retry_delay, row_data, thread_http
+
+# Upper bound on Sheets API requests in flight at once
+_SHEETS_WORKERS = 4
+
+# Sessions with no activity for this long are dropped, and how often to check
+_SESSION_TTL = 12 * 60 * 60
+_SESSION_GC_INTERVAL = 10 * 60
+
+# Final results table columns, and a getter pulling them from a result in order
+_RESULT_HEADER = ["Player Name", "Buy-in", "Rebuys", "Final Stack", "Net Profit/Loss"]
+_RESULT_COLUMNS = itemgetter(*_RESULT_HEADER)
+
+# Reply to !po help
+_HELP_TEXT = """
+🎮 **Poker Manager Bot Commands**
+
+**Game Session Commands:**
+`!po start <buy-in> <player1,player2,...>` - Start new session (ends current session if exists)
+`!po in <player>` - Add player to session
+`!po out <player>` - Remove player from session
+`!po win <player>` - Record game winner (auto-starts next game)
+`!po end` - End current session and show final results
+
+**Information Commands:**
+`!po events` - Show session history
+`!po pnl` - Show all players' profit/loss
+`!po pnl <player>` - Show specific player's profit/loss
+
+**Example:**
+```
+!po start 500 Tuyen, Truong, Cuong
+!po win Tuyen
+!po in Hung
+!po pnl
+!po end
+```
+"""
+
+def _update_cells(sheet_id: int, row_index: int, rows: Sequence[Sequence]) -> Dict:
+    """Build an updateCells request writing rows starting at column A"""
+    return {
+        'updateCells': {
+            'start': {
+                'sheetId': sheet_id,
+                'rowIndex': row_index,
+                'columnIndex': 0
+            },
+            'rows': [row_data(row) for row in rows],
+            'fields': 'userEnteredValue'
+        }
+    }
 
 class PokerPal(commands.Bot):
     def __init__(self):
@@ -21,113 +83,275 @@ class PokerPal(commands.Bot):
         # Setup logging first
         self.setup_logging()
         
-        # Initialize Google Sheets connection
+        # Initialize Google Sheets connection, with one HTTP connection per
+        # thread making requests
+        self._http_local = threading.local()
         self.sheets_service = self._init_google_sheets()
         self.spreadsheet_id = os.getenv('GOOGLE_SHEETS_ID')
         if not self.spreadsheet_id:
             raise ValueError("GOOGLE_SHEETS_ID not found in environment variables")
+        
+        # Sheet titles in the spreadsheet, loaded on first use and kept in
+        # sync as sheets are added
+        self.sheet_titles: Optional[Set[str]] = None
+        self.sheet_titles_lock = asyncio.Lock()
             
         # Active sessions per channel
         self.active_sessions: Dict[int, GameSession] = {}
 
     async def setup_hook(self):
-        """Setup hook to add commands"""
+        """Setup hook to add commands and register them as slash commands"""
         await self.add_cog(Commands(self))
+        await self.tree.sync()
 
     def setup_logging(self):
         """Setup logging configuration"""
         # Create logs directory if it doesn't exist
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-            
-        # Get current date for log file name
-        current_date = datetime.now().strftime('%Y-%m-%d')
-        log_file = f'logs/discord_chat_log_{current_date}.log'
+        os.makedirs('logs', exist_ok=True)
         
-        # Configure logging
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file),
-                logging.StreamHandler()
-            ]
+        formatter = logging.Formatter('%(asctime)s - %(message)s')
+        
+        # Roll the log file over at midnight, keeping a month of history, and
+        # buffer records in memory so bursts of commands don't write to disk
+        # one record at a time
+        file_handler = TimedRotatingFileHandler(
+            'logs/discord_chat_log.log',
+            when='midnight',
+            backupCount=30,
+            encoding='utf-8'
         )
+        file_handler.setFormatter(formatter)
+        handlers = [
+            MemoryHandler(
+                capacity=512,
+                flushLevel=logging.ERROR,
+                target=file_handler
+            )
+        ]
+        
+        # Only echo to stderr when someone is watching, or when asked to
+        if sys.stderr.isatty() or os.getenv('LOG_TO_STDERR'):
+            stream_handler = logging.StreamHandler()
+            stream_handler.setFormatter(formatter)
+            handlers.append(stream_handler)
+        
+        # Configure logging
+        logging.basicConfig(level=logging.INFO, handlers=handlers)
         
         self.logger = logging.getLogger('PokerPal')
 
     def _init_google_sheets(self):
         """Initialize Google Sheets API service"""
         try:
-            service_account_file = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE', 'service-account.json')
-            
-            if not os.path.exists(service_account_file):
-                raise FileNotFoundError(
-                    f"Service account file not found at {service_account_file}"
+            scopes = ['https://www.googleapis.com/auth/spreadsheets']
+            
+            # Prefer credentials passed directly in the environment, then fall
+            # back to the service account file
+            service_account_json = os.getenv('GOOGLE_SERVICE_ACCOUNT_JSON')
+            if service_account_json:
+                credentials = service_account.Credentials.from_service_account_info(
+                    json.loads(service_account_json),
+                    scopes=scopes
+                )
+            else:
+                service_account_file = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE', 'service-account.json')
+                credentials = service_account.Credentials.from_service_account_file(
+                    service_account_file,
+                    scopes=scopes
                 )
             
-            credentials = service_account.Credentials.from_service_account_file(
-                service_account_file,
-                scopes=['https://www.googleapis.com/auth/spreadsheets']
-            )
+            self.credentials = credentials
             
-            return build('sheets', 'v4', credentials=credentials)
+            # Build from the discovery document bundled with the client
+            # instead of fetching it over the network at every start
+            return build(
+                'sheets', 'v4',
+                http=self.sheets_http(),
+                cache_discovery=False,
+                static_discovery=True
+            )
             
         except Exception as e:
             self.logger.error(f"Failed to initialize Google Sheets: {str(e)}")
             raise
 
+    def sheets_http(self) -> AuthorizedHttp:
+        """Get this thread's connection to Google"""
+        return thread_http(self._http_local, self.credentials)
+
 class Commands(commands.Cog):
     def __init__(self, bot: PokerPal):
         self.bot = bot
         self.logger = bot.logger
         self.sheets_service = bot.sheets_service
         self.spreadsheet_id = bot.spreadsheet_id
+        
+        # Blocking Sheets requests run on a small dedicated pool
+        self._executor = ThreadPoolExecutor(max_workers=_SHEETS_WORKERS, thread_name_prefix='sheets')
+        
+        # Debounced sheet writes waiting to start, and the latest write
+        # started, per channel
+        self._pending_writes: Dict[int, Tuple[asyncio.TimerHandle, commands.Context, GameSession]] = {}
+        self._active_writes: Dict[int, asyncio.Task] = {}
+        
+        # Commands changing a channel's session run one at a time, whichever
+        # subcommand they are
+        self._channel_locks: Dict[int, asyncio.Lock] = {}
+
+    async def cog_load(self):
+        """Start dropping idle sessions in the background"""
+        self._gc_task = asyncio.create_task(self._gc_sessions())
+
+    async def cog_unload(self):
+        """Stop background work and release the Sheets worker threads when the cog is removed"""
+        self._gc_task.cancel()
+        for handle, _, _ in self._pending_writes.values():
+            handle.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def _gc_sessions(self):
+        """Periodically drop sessions that have been idle for longer than _SESSION_TTL"""
+        while True:
+            await asyncio.sleep(_SESSION_GC_INTERVAL)
+            cutoff = time.monotonic() - _SESSION_TTL
+            idle = [channel_id for channel_id, session in self.bot.active_sessions.items()
+                    if session.last_activity < cutoff]
+            for channel_id in idle:
+                try:
+                    await self._flush_write(channel_id)
+                except Exception:
+                    # A failed write (or failing to report it, e.g. in a
+                    # deleted channel) mustn't stop sessions being collected
+                    self.logger.exception(f"Error writing idle session in channel {channel_id}")
+                session = self.bot.active_sessions.get(channel_id)
+                if session and session.last_activity < cutoff:
+                    del self.bot.active_sessions[channel_id]
+                    self.logger.info(f"Dropped idle session in channel {channel_id}")
+
+    def _execute_blocking(self, request):
+        """Execute a Sheets API request on the calling worker thread's own connection"""
+        return request.execute(http=self.bot.sheets_http())
+
+    async def _execute(self, request):
+        """Run a blocking Sheets API request without blocking the event loop, retrying transient errors"""
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._executor, self._execute_blocking, request)
+            except HttpError as e:
+                delay = retry_delay(e, attempt, base=0.25, jitter=0.1)
+                if delay is None:
+                    raise
+                self.logger.warning(f"Sheets API returned {e.resp.status}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _get_sheet_titles(self) -> Set[str]:
+        """Get the titles of all sheets in the spreadsheet, fetching them on first use"""
+        async with self.bot.sheet_titles_lock:
+            if self.bot.sheet_titles is None:
+                spreadsheet = await self._execute(self.sheets_service.spreadsheets().get(
+                    spreadsheetId=self.spreadsheet_id,
+                    fields='sheets.properties.title'
+                ))
+                self.bot.sheet_titles = {sheet['properties']['title'] for sheet in spreadsheet.get('sheets', [])}
+            return self.bot.sheet_titles
+
+    def _channel_lock(self, channel_id: int) -> asyncio.Lock:
+        """Get the lock serializing session changes in the channel"""
+        lock = self._channel_locks.get(channel_id)
+        if lock is None:
+            lock = self._channel_locks[channel_id] = asyncio.Lock()
+        return lock
+
+    def _schedule_write(self, ctx: commands.Context, session: GameSession, delay: float = 0.5):
+        """Write the session sheet after a short delay, restarting the delay if a write is already waiting"""
+        channel_id = ctx.channel.id
+        pending = self._pending_writes.get(channel_id)
+        if pending:
+            pending[0].cancel()
+        handle = asyncio.get_running_loop().call_later(delay, self._start_write, channel_id)
+        self._pending_writes[channel_id] = (handle, ctx, session)
+
+    def _start_write(self, channel_id: int):
+        """Start writing the latest session state for the channel"""
+        _, ctx, session = self._pending_writes.pop(channel_id)
+        previous = self._active_writes.get(channel_id)
+        self._active_writes[channel_id] = asyncio.create_task(self._write_after(previous, ctx, session))
+
+    async def _write_after(self, previous: Optional[asyncio.Task], ctx: commands.Context, session: GameSession):
+        """Write the session sheet once the channel's previous write has finished"""
+        if previous:
+            await previous
+        await self.update_session_sheet(ctx, session)
+
+    async def _flush_write(self, channel_id: int):
+        """Start any waiting write for the channel now and wait for its writes to finish"""
+        pending = self._pending_writes.get(channel_id)
+        if pending:
+            pending[0].cancel()
+            self._start_write(channel_id)
+        active = self._active_writes.pop(channel_id, None)
+        if active:
+            await active
+
+    async def cog_command_error(self, ctx: commands.Context, error: commands.CommandError):
+        """Tell users when they hit the command cooldown and log any other error"""
+        if isinstance(error, commands.CommandOnCooldown):
+            await ctx.send(f"⏳ Too many commands, try again in {error.retry_after:.1f}s")
+            return
+        if isinstance(error, (commands.MissingRequiredArgument, commands.BadArgument)):
+            await ctx.send(f"❌ Invalid command. Format: !po {ctx.command.name} {ctx.command.usage}")
+            return
+        self.logger.error(f"Error in command {ctx.command}: {str(error)}", exc_info=error)
 
     @commands.command()
     async def ping(self, ctx: commands.Context):
         """Simple ping command"""
         await ctx.send('pong')
 
-    @commands.command()
-    async def po(self, ctx: commands.Context, *args):
+    async def _get_session(self, ctx: commands.Context) -> Optional[GameSession]:
+        """Get the channel's active session, telling the user if there isn't one"""
+        session = self.bot.active_sessions.get(ctx.channel.id)
+        if not session:
+            await ctx.send("❌ No active game session. Start one with !po start")
+        return session
+
+    @commands.hybrid_group(case_insensitive=True, invoke_without_command=True)
+    async def po(self, ctx: commands.Context):
         """Handle poker commands"""
-        if not args:
-            await ctx.send("❌ Invalid command. Use '!po help' to see available commands.")
-            return
+        # Only reached when no known subcommand was given
+        await ctx.send("❌ Invalid command. Use '!po help' to see available commands.")
 
-        command = args[0].lower()
-        channel_id = ctx.channel.id
+    @po.command(name='help')
+    async def po_help(self, ctx: commands.Context):
+        """Show available commands"""
+        await self.send_help(ctx)
 
-        # Handle commands that don't require active session first
-        if command == 'help':
-            await self.send_help(ctx)
-            return
-        elif command == 'events' or command == 'event':
-            session = self.bot.active_sessions.get(channel_id)
-            if not session:
-                await ctx.send("❌ No active game session. Start one with !po start")
-                return
-            events_display = session.format_events()
-            await ctx.send(events_display)
-            return
-        elif command == 'start':
-            if len(args) < 3:
-                await ctx.send("❌ Invalid start command. Format: !po start <buy-in> <player1,player2,...>")
+    @po.command(name='events', aliases=['event'])
+    async def po_events(self, ctx: commands.Context):
+        """Show the session history"""
+        session = await self._get_session(ctx)
+        if session:
+            await ctx.send(session.format_events())
+
+    @po.command(name='start', usage='<buy-in> <player1,player2,...>')
+    @commands.cooldown(3, 5.0, commands.BucketType.channel)
+    async def po_start(self, ctx: commands.Context, buy_in: float, *, players: str):
+        """Start a new session, ending the current one if there is one"""
+        await ctx.defer()
+        channel_id = ctx.channel.id
+        
+        try:
+            # Split the player list by comma, then strip whitespace
+            player_list = [p.strip() for p in players.split(',') if p.strip()]
+            
+            if not player_list:
+                await ctx.send("❌ No valid players provided. Format: !po start <buy-in> <player1,player2,...>")
                 return
                 
-            try:
-                buy_in = float(args[1])
-                # Join all remaining args and split by comma, then strip whitespace
-                players_str = ' '.join(args[2:])
-                players = [p.strip() for p in players_str.split(',') if p.strip()]
-                
-                if not players:
-                    await ctx.send("❌ No valid players provided. Format: !po start <buy-in> <player1,player2,...>")
-                    return
-                    
+            async with self._channel_lock(channel_id):
                 # If there's an active session, end it first
                 if channel_id in self.bot.active_sessions:
+                    await self._flush_write(channel_id)
                     old_session = self.bot.active_sessions[channel_id]
                     success, message = old_session.get_player_pnl()
                     if success:
@@ -135,139 +359,109 @@ class Commands(commands.Cog):
                     del self.bot.active_sessions[channel_id]
                     
                 # Create new session
-                session = GameSession(buy_in, players)
+                session = GameSession(buy_in, player_list)
                 self.bot.active_sessions[channel_id] = session
-                
-                # Send success message first
-                total_prize = len(players) * buy_in
-                message = [
-                    "🎲 **New Poker Session Started!**",
-                    f"💵 Buy-in: ${buy_in}",
-                    f"👥 Players: {', '.join(players)}",
-                    f"💰 Prize Pool: ${total_prize}",
-                    f"\n🎮 Game #1 is starting now!"
-                ]
-                await ctx.send("\n".join(message))
-                
-                # Then update spreadsheet
-                try:
-                    await self.create_session_sheet(ctx, session)
-                except Exception as e:
-                    self.logger.error(f"Failed to create session sheet: {str(e)}")
-                    await ctx.send("⚠️ Warning: Failed to save to spreadsheet, but game will continue.")
-                
-            except ValueError:
-                await ctx.send("❌ Invalid buy-in amount. Please provide a number.")
-                return
-            except Exception as e:
-                self.logger.error(f"Unexpected error in start command: {str(e)}")
-                await ctx.send("❌ An error occurred while starting the session. Please try again.")
-                return
-
-        # All other commands require an active session
-        session = self.bot.active_sessions.get(channel_id)
-        if not session:
-            await ctx.send("❌ No active game session. Start one with !po start")
-            return
+            
+            # Build success message
+            total_prize = len(player_list) * buy_in
+            message = [
+                "🎲 **New Poker Session Started!**",
+                f"💵 Buy-in: ${buy_in}",
+                f"👥 Players: {', '.join(player_list)}",
+                f"💰 Prize Pool: ${total_prize}",
+                f"\n🎮 Game #1 is starting now!"
+            ]
+            
+            # Announce the session and create its sheet concurrently. Other
+            # commands may already use the session meanwhile; their changes
+            # are written once the sheet exists
+            send_result, sheet_result = await asyncio.gather(
+                ctx.send("\n".join(message)),
+                self.create_session_sheet(ctx, session),
+                return_exceptions=True
+            )
+            if isinstance(send_result, Exception):
+                self.logger.error(f"Failed to send start message: {str(send_result)}")
+            if isinstance(sheet_result, Exception):
+                self.logger.error(f"Failed to create session sheet: {str(sheet_result)}")
+                await ctx.send("⚠️ Warning: Failed to save to spreadsheet, but game will continue.")
+            
+        except Exception as e:
+            self.logger.error(f"Unexpected error in start command: {str(e)}")
+            await ctx.send("❌ An error occurred while starting the session. Please try again.")
 
-        if command == 'in':
-            # Get player name by joining remaining args to handle spaces
-            if len(args) < 2:
-                await ctx.send("❌ Invalid command. Format: !po in <player-name>")
-                return
-                
-            player_name = ' '.join(args[1:]).strip()
-            if not player_name:
-                await ctx.send("❌ Invalid command. Format: !po in <player-name>")
+    @po.command(name='in', usage='<player-name>')
+    @commands.cooldown(3, 5.0, commands.BucketType.channel)
+    async def po_in(self, ctx: commands.Context, *, player: str):
+        """Add a player to the session"""
+        async with self._channel_lock(ctx.channel.id):
+            session = await self._get_session(ctx)
+            if not session:
                 return
                 
-            success, message = session.add_player(player_name)
+            success, message = session.add_player(player)
             await ctx.send(message)
             if success:
-                try:
-                    await self.update_session_sheet(ctx, session)
-                except Exception as e:
-                    self.logger.error(f"Failed to update session sheet: {str(e)}")
-                    await ctx.send("⚠️ Warning: Failed to save to spreadsheet, but game will continue.")
+                self._schedule_write(ctx, session)
 
-        elif command == 'out':
-            # Get player name by joining remaining args to handle spaces
-            if len(args) < 2:
-                await ctx.send("❌ Invalid command. Format: !po out <player-name>")
-                return
-                
-            player_name = ' '.join(args[1:]).strip()
-            if not player_name:
-                await ctx.send("❌ Invalid command. Format: !po out <player-name>")
+    @po.command(name='out', usage='<player-name>')
+    @commands.cooldown(3, 5.0, commands.BucketType.channel)
+    async def po_out(self, ctx: commands.Context, *, player: str):
+        """Remove a player from the session"""
+        async with self._channel_lock(ctx.channel.id):
+            session = await self._get_session(ctx)
+            if not session:
                 return
                 
-            success, message = session.remove_player(player_name)
+            success, message = session.remove_player(player)
             await ctx.send(message)
             if success:
-                try:
-                    await self.update_session_sheet(ctx, session)
-                except Exception as e:
-                    self.logger.error(f"Failed to update session sheet: {str(e)}")
-                    await ctx.send("⚠️ Warning: Failed to save to spreadsheet, but game will continue.")
+                self._schedule_write(ctx, session)
 
-        elif command == 'win':
-            if len(args) < 2:
-                await ctx.send("❌ Invalid command. Format: !po win <player-name>")
+    @po.command(name='win', usage='<player-name>')
+    @commands.cooldown(3, 5.0, commands.BucketType.channel)
+    async def po_win(self, ctx: commands.Context, *, player: str):
+        """Record the winner of the current game"""
+        async with self._channel_lock(ctx.channel.id):
+            session = await self._get_session(ctx)
+            if not session:
                 return
                 
-            winner = ' '.join(args[1:]).strip()
-            success, message = session.set_winner(winner)
+            success, message = session.set_winner(player)
             await ctx.send(message)
             if success:
-                try:
-                    await self.update_session_sheet(ctx, session)
-                except Exception as e:
-                    self.logger.error(f"Failed to update session sheet: {str(e)}")
-                    await ctx.send("⚠️ Warning: Failed to save to spreadsheet, but game will continue.")
-
-        elif command == 'pnl':
-            # Handle pnl for specific player with spaces in name
-            player_name = None
-            if len(args) > 1:
-                player_name = ' '.join(args[1:]).strip()
-                
-            success, message = session.get_player_pnl(player_name)
+                self._schedule_write(ctx, session)
+
+    @po.command(name='pnl', usage='[player-name]')
+    async def po_pnl(self, ctx: commands.Context, *, player: Optional[str] = None):
+        """Show profit/loss for all players or a specific one"""
+        session = await self._get_session(ctx)
+        if session:
+            success, message = session.get_player_pnl(player)
             await ctx.send(message)
+
+    @po.command(name='end')
+    @commands.cooldown(3, 5.0, commands.BucketType.channel)
+    async def po_end(self, ctx: commands.Context):
+        """End the session and show final results"""
+        async with self._channel_lock(ctx.channel.id):
+            session = await self._get_session(ctx)
+            if not session:
+                return
+                
+            # Make sure the final state reaches the sheet
+            await ctx.defer()
+            await self._flush_write(ctx.channel.id)
             
-        elif command == 'end':
             success, message = session.get_player_pnl()
             if success:
                 await ctx.send("📊 **Final Session Results:**\n" + message)
-            del self.bot.active_sessions[channel_id]
+            del self.bot.active_sessions[ctx.channel.id]
             await ctx.send("👋 Session ended!")
             
     async def send_help(self, ctx: commands.Context):
         """Send help message"""
-        help_text = """
-🎮 **Poker Manager Bot Commands**
-
-**Game Session Commands:**
-`!po start <buy-in> <player1,player2,...>` - Start new session (ends current session if exists)
-`!po in <player>` - Add player to session
-`!po out <player>` - Remove player from session
-`!po win <player>` - Record game winner (auto-starts next game)
-`!po end` - End current session and show final results
-
-**Information Commands:**
-`!po events` - Show session history
-`!po pnl` - Show all players' profit/loss
-`!po pnl <player>` - Show specific player's profit/loss
-
-**Example:**
-```
-!po start 500 Tuyen, Truong, Cuong
-!po win Tuyen
-!po in Hung
-!po pnl
-!po end
-```
-"""
-        await ctx.send(help_text)
+        await ctx.send(_HELP_TEXT)
 
     async def create_session_sheet(self, ctx: commands.Context, session: GameSession):
         """Create a new sheet for the session"""
@@ -276,346 +470,296 @@ class Commands(commands.Cog):
             sheet_name = base_sheet_name
             counter = 1
             
-            # Get existing sheets
-            spreadsheet = self.sheets_service.spreadsheets().get(
-                spreadsheetId=self.spreadsheet_id
-            ).execute()
-            
-            # Get list of existing sheet names
-            existing_sheets = [
-                sheet['properties']['title'] 
-                for sheet in spreadsheet.get('sheets', [])
-            ]
+            # A name without an ID marks the sheet as being created, so writes
+            # in the meantime wait for it (the final name is stored below)
+            session.sheet_name = sheet_name
             
             # Find a unique name by adding counter if needed
-            while sheet_name in existing_sheets:
+            sheet_titles = await self._get_sheet_titles()
+            while sheet_name in sheet_titles:
                 counter += 1
                 sheet_name = f"{base_sheet_name}_{counter}"
             
-            self.logger.info(f"Creating new sheet: {sheet_name}")
-            
-            # Store the sheet name in the session for later use
-            session.sheet_name = sheet_name
-            
-            # Create new sheet with formatting
-            request = {
-                'requests': [
-                    {
-                        'addSheet': {
-                            'properties': {
-                                'title': sheet_name,
-                                'gridProperties': {
-                                    'rowCount': 200,
-                                    'columnCount': 26  # Increased for more players
-                                }
+            # Create the sheet, format it and write its initial values in a
+            # single request. The sheet ID is picked here so the formatting
+            # requests can refer to it; if the title (or, very rarely, the ID)
+            # is already taken, move on to the next name and a fresh ID
+            tracking_data = session.get_tracking_data()
+            refreshed = False
+            while True:
+                self.logger.info(f"Creating new sheet: {sheet_name}")
+                new_sheet_id = random.randrange(1, 2 ** 31)
+                
+                # Create new sheet with gridlines hidden
+                add_sheet = {
+                    'addSheet': {
+                        'properties': {
+                            'sheetId': new_sheet_id,
+                            'title': sheet_name,
+                            'gridProperties': {
+                                'rowCount': 200,
+                                'columnCount': 26,  # Increased for more players
+                                'hideGridlines': True
                             }
                         }
-                    },
-                    # Hide gridlines
-                    {
-                        'updateSheetProperties': {
-                            'properties': {
-                                'sheetId': None,  # Will be filled after sheet creation
-                                'gridProperties': {
-                                    'hideGridlines': True
-                                }
-                            },
-                            'fields': 'gridProperties.hideGridlines'
-                        }
                     }
-                ]
-            }
-            
-            # Create the sheet first
-            response = self.sheets_service.spreadsheets().batchUpdate(
-                spreadsheetId=self.spreadsheet_id,
-                body=request
-            ).execute()
-            
-            # Get the new sheet ID
-            new_sheet_id = None
-            for reply in response.get('replies', []):
-                if 'addSheet' in reply:
-                    new_sheet_id = reply['addSheet']['properties']['sheetId']
+                }
+                requests = [add_sheet] + self._sheet_setup_requests(new_sheet_id, session, tracking_data)
+                
+                # Record what this write covers before awaiting it, so changes made
+                # while the sheet is being created are picked up by the next write
+                session.tracking_rows_written = len(tracking_data)
+                session.stats_dirty = False
+                try:
+                    await self._execute(self.sheets_service.spreadsheets().batchUpdate(
+                        spreadsheetId=self.spreadsheet_id,
+                        body={'requests': requests}
+                    ))
                     break
+                except Exception as e:
+                    session.tracking_rows_written = 0
+                    session.stats_dirty = True
+                    if not isinstance(e, HttpError) or e.resp.status != 400 or "already exists" not in str(e):
+                        raise
+                    if not refreshed:
+                        # Sheets may have been added outside the bot since the
+                        # titles were loaded, so reload them once
+                        refreshed = True
+                        self.bot.sheet_titles = None
+                        sheet_titles = await self._get_sheet_titles()
+                    else:
+                        sheet_titles.add(sheet_name)
+                    while sheet_name in sheet_titles:
+                        counter += 1
+                        sheet_name = f"{base_sheet_name}_{counter}"
+            
+            sheet_titles.add(sheet_name)
+            
+            # Store the sheet in the session for later use
+            session.sheet_name = sheet_name
+            session.sheet_id = new_sheet_id
+            self.logger.info(f"Successfully set up sheet: {sheet_name}")
             
-            if new_sheet_id is None:
-                raise Exception("Failed to get new sheet ID")
+            # Commands handled while the sheet was being created couldn't be
+            # written yet, so write them now
+            if session.stats_dirty or len(tracking_data) > session.tracking_rows_written:
+                self._schedule_write(ctx, session)
             
-            # Apply formatting
-            format_request = {
-                'requests': [
-                    # Format header section
-                    {
-                        'repeatCell': {
-                            'range': {
-                                'sheetId': new_sheet_id,
-                                'startRowIndex': 0,
-                                'endRowIndex': 2,
-                                'startColumnIndex': 0,
-                                'endColumnIndex': 2
-                            },
-                            'cell': {
-                                'userEnteredFormat': {
-                                    'backgroundColor': {
-                                        'red': 0.95,
-                                        'green': 0.95,
-                                        'blue': 0.95
-                                    },
-                                    'textFormat': {
-                                        'bold': True
-                                    }
-                                }
-                            },
-                            'fields': 'userEnteredFormat(backgroundColor,textFormat)'
-                        }
+        except Exception as e:
+            session.sheet_name = None
+            error_msg = str(e)
+            self.logger.error(f"Error creating session sheet: {error_msg}")
+            if "Invalid value" in error_msg:
+                await ctx.send("❌ Error: Invalid characters in player names or values")
+            elif "insufficient permissions" in error_msg.lower():
+                await ctx.send("❌ Error: Bot doesn't have permission to access the spreadsheet")
+            elif "not found" in error_msg.lower():
+                await ctx.send("❌ Error: Spreadsheet not found. Please check the spreadsheet ID")
+            else:
+                await ctx.send("❌ Error creating game sheet. Please check bot permissions and spreadsheet settings.")
+            raise
+
+    def _sheet_setup_requests(self, sheet_id: int, session: GameSession, tracking_data: List[Tuple]) -> List[Dict]:
+        """Build the formatting and initial values for a new session sheet"""
+        # Session info and event tracking headers
+        session_info = [
+            ["Date", session.date],
+            ["Buy-in Amount", session.buy_in]
+        ]
+        tracking_header = [["Date", "Event Type", "Player Name", "Action", "Current Stack"]]
+        
+        return [
+            # Format header section
+            {
+                'repeatCell': {
+                    'range': {
+                        'sheetId': sheet_id,
+                        'startRowIndex': 0,
+                        'endRowIndex': 2,
+                        'startColumnIndex': 0,
+                        'endColumnIndex': 2
                     },
-                    # Format player stats header
-                    {
-                        'repeatCell': {
-                            'range': {
-                                'sheetId': new_sheet_id,
-                                'startRowIndex': 2,
-                                'endRowIndex': 3,
-                                'startColumnIndex': 0,
-                                'endColumnIndex': 26
-                            },
-                            'cell': {
-                                'userEnteredFormat': {
-                                    'backgroundColor': {
-                                        'red': 0.8,
-                                        'green': 0.8,
-                                        'blue': 0.95
-                                    },
-                                    'textFormat': {
-                                        'bold': True
-                                    }
-                                }
+                    'cell': {
+                        'userEnteredFormat': {
+                            'backgroundColor': {
+                                'red': 0.95,
+                                'green': 0.95,
+                                'blue': 0.95
                             },
-                            'fields': 'userEnteredFormat(backgroundColor,textFormat)'
+                            'textFormat': {
+                                'bold': True
+                            }
                         }
                     },
-                    # Format player stats rows
-                    {
-                        'repeatCell': {
-                            'range': {
-                                'sheetId': new_sheet_id,
-                                'startRowIndex': 3,
-                                'endRowIndex': 7,
-                                'startColumnIndex': 0,
-                                'endColumnIndex': 26
-                            },
-                            'cell': {
-                                'userEnteredFormat': {
-                                    'backgroundColor': {
-                                        'red': 0.95,
-                                        'green': 0.95,
-                                        'blue': 1.0
-                                    }
-                                }
+                    'fields': 'userEnteredFormat(backgroundColor,textFormat)'
+                }
+            },
+            # Format player stats header
+            {
+                'repeatCell': {
+                    'range': {
+                        'sheetId': sheet_id,
+                        'startRowIndex': 2,
+                        'endRowIndex': 3,
+                        'startColumnIndex': 0,
+                        'endColumnIndex': 26
+                    },
+                    'cell': {
+                        'userEnteredFormat': {
+                            'backgroundColor': {
+                                'red': 0.8,
+                                'green': 0.8,
+                                'blue': 0.95
                             },
-                            'fields': 'userEnteredFormat(backgroundColor)'
+                            'textFormat': {
+                                'bold': True
+                            }
                         }
                     },
-                    # Format events header
-                    {
-                        'repeatCell': {
-                            'range': {
-                                'sheetId': new_sheet_id,
-                                'startRowIndex': 8,
-                                'endRowIndex': 9,
-                                'startColumnIndex': 0,
-                                'endColumnIndex': 5
-                            },
-                            'cell': {
-                                'userEnteredFormat': {
-                                    'backgroundColor': {
-                                        'red': 0.8,
-                                        'green': 0.9,
-                                        'blue': 0.8
-                                    },
-                                    'textFormat': {
-                                        'bold': True
-                                    }
-                                }
-                            },
-                            'fields': 'userEnteredFormat(backgroundColor,textFormat)'
+                    'fields': 'userEnteredFormat(backgroundColor,textFormat)'
+                }
+            },
+            # Format player stats rows
+            {
+                'repeatCell': {
+                    'range': {
+                        'sheetId': sheet_id,
+                        'startRowIndex': 3,
+                        'endRowIndex': 7,
+                        'startColumnIndex': 0,
+                        'endColumnIndex': 26
+                    },
+                    'cell': {
+                        'userEnteredFormat': {
+                            'backgroundColor': {
+                                'red': 0.95,
+                                'green': 0.95,
+                                'blue': 1.0
+                            }
                         }
                     },
-                    # Add borders around player stats
-                    {
-                        'updateBorders': {
-                            'range': {
-                                'sheetId': new_sheet_id,
-                                'startRowIndex': 2,
-                                'endRowIndex': 7,
-                                'startColumnIndex': 0,
-                                'endColumnIndex': 26
-                            },
-                            'top': {
-                                'style': 'SOLID',
-                                'width': 1,
-                                'color': {'red': 0.7, 'green': 0.7, 'blue': 0.7}
-                            },
-                            'bottom': {
-                                'style': 'SOLID',
-                                'width': 1,
-                                'color': {'red': 0.7, 'green': 0.7, 'blue': 0.7}
-                            },
-                            'left': {
-                                'style': 'SOLID',
-                                'width': 1,
-                                'color': {'red': 0.7, 'green': 0.7, 'blue': 0.7}
+                    'fields': 'userEnteredFormat(backgroundColor)'
+                }
+            },
+            # Format events header
+            {
+                'repeatCell': {
+                    'range': {
+                        'sheetId': sheet_id,
+                        'startRowIndex': 8,
+                        'endRowIndex': 9,
+                        'startColumnIndex': 0,
+                        'endColumnIndex': 5
+                    },
+                    'cell': {
+                        'userEnteredFormat': {
+                            'backgroundColor': {
+                                'red': 0.8,
+                                'green': 0.9,
+                                'blue': 0.8
                             },
-                            'right': {
-                                'style': 'SOLID',
-                                'width': 1,
-                                'color': {'red': 0.7, 'green': 0.7, 'blue': 0.7}
+                            'textFormat': {
+                                'bold': True
                             }
                         }
-                    }
-                ]
-            }
-            
-            # Apply formatting
-            self.sheets_service.spreadsheets().batchUpdate(
-                spreadsheetId=self.spreadsheet_id,
-                body=format_request
-            ).execute()
-            
-            self.logger.info(f"Successfully created sheet: {sheet_name}")
-            
-            # Add session info
-            self.logger.info("Adding session info")
-            self.sheets_service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!A1:B2",
-                valueInputOption='RAW',
-                body={
-                    'values': [
-                        ["Date", session.date],
-                        ["Buy-in Amount", session.buy_in]
-                    ]
+                    },
+                    'fields': 'userEnteredFormat(backgroundColor,textFormat)'
                 }
-            ).execute()
-            
-            # Add player stats header and initial data
-            self.update_player_stats(session, sheet_name)
-            
-            # Add event tracking headers
-            self.logger.info("Adding tracking headers")
-            self.sheets_service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!A9:E9",
-                valueInputOption='RAW',
-                body={
-                    'values': [["Date", "Event Type", "Player Name", "Action", "Current Stack"]]
+            },
+            # Add borders around player stats
+            {
+                'updateBorders': {
+                    'range': {
+                        'sheetId': sheet_id,
+                        'startRowIndex': 2,
+                        'endRowIndex': 7,
+                        'startColumnIndex': 0,
+                        'endColumnIndex': 26
+                    },
+                    'top': {
+                        'style': 'SOLID',
+                        'width': 1,
+                        'color': {'red': 0.7, 'green': 0.7, 'blue': 0.7}
+                    },
+                    'bottom': {
+                        'style': 'SOLID',
+                        'width': 1,
+                        'color': {'red': 0.7, 'green': 0.7, 'blue': 0.7}
+                    },
+                    'left': {
+                        'style': 'SOLID',
+                        'width': 1,
+                        'color': {'red': 0.7, 'green': 0.7, 'blue': 0.7}
+                    },
+                    'right': {
+                        'style': 'SOLID',
+                        'width': 1,
+                        'color': {'red': 0.7, 'green': 0.7, 'blue': 0.7}
+                    }
                 }
-            ).execute()
-            
-            # Add initial tracking data
-            tracking_data = session.get_tracking_data()
-            if tracking_data:
-                self.logger.info("Adding initial tracking data")
-                self.sheets_service.spreadsheets().values().append(
-                    spreadsheetId=self.spreadsheet_id,
-                    range=f"{sheet_name}!A10:E10",
-                    valueInputOption='RAW',
-                    insertDataOption='INSERT_ROWS',
-                    body={'values': tracking_data}
-                ).execute()
-            
-            self.logger.info(f"Successfully set up sheet: {sheet_name}")
-            
-        except Exception as e:
-            error_msg = str(e)
-            self.logger.error(f"Error creating session sheet: {error_msg}")
-            if "Invalid value" in error_msg:
-                await ctx.send("❌ Error: Invalid characters in player names or values")
-            elif "insufficient permissions" in error_msg.lower():
-                await ctx.send("❌ Error: Bot doesn't have permission to access the spreadsheet")
-            elif "not found" in error_msg.lower():
-                await ctx.send("❌ Error: Spreadsheet not found. Please check the spreadsheet ID")
-            else:
-                await ctx.send("❌ Error creating game sheet. Please check bot permissions and spreadsheet settings.")
-            raise
+            },
+            # Session info, player stats, tracking header and initial events
+            _update_cells(sheet_id, 0, session_info),
+            _update_cells(sheet_id, 2, self.build_player_stats(session)),
+            _update_cells(sheet_id, 8, tracking_header),
+            _update_cells(sheet_id, 9, tracking_data)
+        ]
 
-    def update_player_stats(self, session: GameSession, sheet_name: str):
-        """Update the player statistics section in columns"""
-        # Get all players who have ever been in the game
-        all_players = sorted(list(set(session.player_join_game.keys())))
-        
-        # Create column headers (player names)
-        headers = ["Games in Session", ""] + all_players
-        
-        # Create rows for each stat
-        games_played = ["Games Played", session.game_count - 1]
-        games_won = ["Games Won", ""]
-        total_buyin = ["Total Buy-in", ""]
-        net_pnl = ["Net P/L", ""]
-        
-        # Fill in stats for each player
-        for player in all_players:
-            # Games played by this player
-            played = session.get_player_games_played(player)
-            games_played.append(played)
-            
-            # Games won by this player
-            won = session.win_counts.get(player, 0)
-            games_won.append(won)
-            
-            # Total buy-in for this player
-            buyin = session.buy_in * played
-            total_buyin.append(buyin)
-            
-            # Net P/L for this player
-            winnings = session.total_winnings.get(player, 0)
-            pnl = winnings - buyin
-            net_pnl.append(pnl)
-        
-        # Update the sheet
-        self.sheets_service.spreadsheets().values().update(
-            spreadsheetId=self.spreadsheet_id,
-            range=f"{sheet_name}!A3:Z7",
-            valueInputOption='RAW',
-            body={
-                'values': [
-                    headers,
-                    games_played,
-                    games_won,
-                    total_buyin,
-                    net_pnl
-                ]
-            }
-        ).execute()
+    def build_player_stats(self, session: GameSession) -> List[List]:
+        """Build the player statistics section in columns"""
+        games_played, games_won, total_buyin, net_pnl = session.get_stats_rows()
+        return [
+            ["Games in Session", ""] + session.sorted_players,
+            ["Games Played", session.game_count - 1] + games_played,
+            ["Games Won", ""] + games_won,
+            ["Total Buy-in", ""] + total_buyin,
+            ["Net P/L", ""] + net_pnl
+        ]
 
     async def update_session_sheet(self, ctx: commands.Context, session: GameSession):
         """Update the session sheet with new events"""
         try:
-            # Use the stored sheet name from session creation
-            if not hasattr(session, 'sheet_name'):
-                raise Exception("Sheet name not found in session")
+            # Use the stored sheet ID from session creation. While the sheet
+            # is still being created, leave the changes for the write that
+            # follows its creation
+            if session.sheet_id is None:
+                if session.sheet_name is not None:
+                    return
+                raise Exception("Sheet ID not found in session")
                 
-            sheet_name = session.sheet_name
+            sheet_id = session.sheet_id
             
-            # Update player stats
-            self.update_player_stats(session, sheet_name)
-            
-            # Update tracking data - clear existing data first
-            self.sheets_service.spreadsheets().values().clear(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!A10:E1000"
-            ).execute()
-            
-            # Then add all tracking data
+            # Events are only ever appended, so the rows already on the sheet
+            # never change; nothing to do if there are no new rows or stats
             tracking_data = session.get_tracking_data()
-            if tracking_data:
-                self.sheets_service.spreadsheets().values().update(
+            written_rows = session.tracking_rows_written
+            new_rows = tracking_data[written_rows:]
+            if not new_rows and not session.stats_dirty:
+                return
+            
+            # Write player stats (only if they changed) and the newly appended
+            # tracking rows as typed cells in a single request
+            requests = []
+            stats_dirty = session.stats_dirty
+            if stats_dirty:
+                requests.append(_update_cells(sheet_id, 2, self.build_player_stats(session)))
+            if new_rows:
+                requests.append(_update_cells(sheet_id, 9 + written_rows, new_rows))
+            
+            # Record what this write covers before awaiting it, so changes made
+            # while the request is in flight are picked up by the next write
+            session.tracking_rows_written = len(tracking_data)
+            session.stats_dirty = False
+            try:
+                await self._execute(self.sheets_service.spreadsheets().batchUpdate(
                     spreadsheetId=self.spreadsheet_id,
-                    range=f"{sheet_name}!A10:E{9+len(tracking_data)}",
-                    valueInputOption='RAW',
-                    body={'values': tracking_data}
-                ).execute()
+                    body={'requests': requests}
+                ))
+            except Exception:
+                session.tracking_rows_written = min(session.tracking_rows_written, written_rows)
+                if stats_dirty:
+                    session.stats_dirty = True
+                raise
             
         except Exception as e:
             self.logger.error(f"Error updating session sheet: {str(e)}")
@@ -624,33 +768,41 @@ class Commands(commands.Cog):
     async def finalize_session_sheet(self, ctx: commands.Context, session: GameSession):
         """Finalize the session sheet with results"""
         try:
-            sheet_name = f"Session_{session.date}"
-            
-            # Update session info one last time
-            await self.update_session_sheet(ctx, session)
-            
-            # Add final results headers
-            results_start_row = 8 + len(session.get_tracking_data()) + 2
-            self.sheets_service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!A{results_start_row}:E{results_start_row}",
-                valueInputOption='RAW',
-                body={
-                    'values': [["Player Name", "Buy-in", "Rebuys", "Final Stack", "Net Profit/Loss"]]
-                }
-            ).execute()
+            if session.sheet_id is None:
+                raise Exception("Sheet ID not found in session")
+                
+            sheet_name = session.sheet_name
+            sheet_id = session.sheet_id
+            tracking_data = session.get_tracking_data()
+            written_rows = session.tracking_rows_written
             
             # Add final results
+            results_start_row = 8 + len(tracking_data) + 2
             results = session.get_final_results()
-            results_data = [[r["Player Name"], r["Buy-in"], r["Rebuys"], 
-                           r["Final Stack"], r["Net Profit/Loss"]] for r in results]
-            
-            self.sheets_service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!A{results_start_row+1}:E{results_start_row+len(results)}",
-                valueInputOption='RAW',
-                body={'values': results_data}
-            ).execute()
+            results_data = list(map(list, map(_RESULT_COLUMNS, results)))
+            
+            # Update stats one last time, add any tracking rows not written yet
+            # and the final results table below them in a single request
+            requests = [_update_cells(sheet_id, 2, self.build_player_stats(session))]
+            if len(tracking_data) > written_rows:
+                requests.append(_update_cells(sheet_id, 9 + written_rows, tracking_data[written_rows:]))
+            requests.append(_update_cells(sheet_id, results_start_row - 1, [_RESULT_HEADER] + results_data))
+            
+            # Record what this write covers before awaiting it, so changes made
+            # while the request is in flight are picked up by the next write
+            stats_dirty = session.stats_dirty
+            session.tracking_rows_written = len(tracking_data)
+            session.stats_dirty = False
+            try:
+                await self._execute(self.sheets_service.spreadsheets().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id,
+                    body={'requests': requests}
+                ))
+            except Exception:
+                session.tracking_rows_written = min(session.tracking_rows_written, written_rows)
+                if stats_dirty:
+                    session.stats_dirty = True
+                raise
             
             self.logger.info(f"Finalized session sheet: {sheet_name}")
             
@@ -669,8 +821,13 @@ async def main():
         
     # Create and start bot
     bot = PokerPal()
+    
+    # Close the bot on SIGTERM too, so asyncio.run returns normally and
+    # buffered log records are written on exit
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, lambda: asyncio.create_task(bot.close())
+    )
     await bot.start(token)
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main()) 
\ No newline at end of file
@@ -1,71 +1,157 @@
+import time
+from bisect import insort
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
+# Formatter for how each event type is shown in the session history
+_EVENT_FORMATS = {
+    "JOIN": "➡️ {player} joined with ${stack}".format,
+    "IN": "✅ {player} bought in with ${stack}".format,
+    "OUT": "❌ {player} left the game".format,
+    "WIN": "🏆 {player} {action} with ${stack} (Win #{wins})".format,
+    "ROUND": "🎲 {action} started - All players reset to ${stack}".format
+}
+
+# (day ordinal, formatted date) for the last default session date
+_DATE_CACHE = (0, "")
+
+# Dividers used in the P/L summary and session history
+_PNL_DIVIDER = "─" * 30
+_PLAYER_DIVIDER = "─" * 20
+_EVENTS_DIVIDER = "─" * 40
+
+# One player's block in the P/L summary
+_PNL_PLAYER_FORMAT = (
+    "{status} {player}:\n"
+    "  Games Played: {games_played}\n"
+    "  Games Won: {wins}\n"
+    "  Total Buy-in: ${total_buyin}\n"
+    "  Total Won: ${winnings}\n"
+    "  Net P/L: {pnl}\n"
+    + _PLAYER_DIVIDER
+)
+
+def _today() -> str:
+    """Today's date as YYYY-MM-DD, formatted once per day"""
+    global _DATE_CACHE
+    now = datetime.now()
+    ordinal = now.toordinal()
+    if _DATE_CACHE[0] != ordinal:
+        _DATE_CACHE = (ordinal, now.strftime('%Y-%m-%d'))
+    return _DATE_CACHE[1]
+
+def _dollars(cents: int) -> float:
+    """Convert an amount in cents back to dollars for display and the sheet"""
+    return cents / 100
+
 class GameSession:
+    __slots__ = (
+        'date', 'buy_in', '_buy_in_cents', 'active_players', 'initial_players', 'events', 'winner',
+        'is_active', 'game_count', '_idx', '_winnings', '_join_game',
+        '_leave_game', '_wins', '_sorted_players', '_stats_rows',
+        'stats_dirty', 'sheet_name', 'sheet_id', 'tracking_rows_written', 'last_activity', '_event_lines'
+    )
+    
     def __init__(self, buy_in: float, players: List[str], date: str = None):
-        self.date = date or datetime.now().strftime('%Y-%m-%d')
+        if date is not None:
+            self.date = date
+        else:
+            self.date = _today()
         self.buy_in = buy_in
-        self.active_players = {player: buy_in for player in players}  # player: current_stack
+        self._buy_in_cents = round(buy_in * 100)  # Amounts are kept as whole cents internally
+        self.active_players = dict.fromkeys(players, self._buy_in_cents)  # player: current_stack in cents
         self.initial_players = players.copy()
         self.events = []  # List of (date, event_type, player, action, current_stack)
+        self._event_lines = []  # Display line for each event, rendered as it is recorded
         self.winner = None
         self.is_active = True
         self.game_count = 1  # Start from game #1
-        self.total_winnings = {}  # Track total winnings per player
-        self.player_join_game = {}  # Track which game number each player joined at
-        self.player_leave_game = {}  # Track which game number each player left at
-        self.win_counts = {}  # Track number of wins per player
         
-        # Initialize tracking data for all players
+        # Per-player stats, stored column-wise at the player's index in _idx
+        self._idx = {}  # player: index into the lists below
+        self._winnings = []  # Total winnings in cents
+        self._join_game = []  # Game number the player (last) joined at
+        self._leave_game = []  # Game number the player left at, None while active
+        self._wins = []  # Number of wins
+        self._sorted_players = []  # Everyone who has ever joined, by name
+        
+        self._stats_rows = None  # Cached per-player stat rows, rebuilt after changes
+        self.stats_dirty = True  # Stats changed since they were last saved
+        self.sheet_name = None  # Spreadsheet tab holding this session, once created
+        self.sheet_id = None
+        self.tracking_rows_written = 0  # Tracking rows last written to the sheet
+        self.last_activity = time.monotonic()  # When the session last changed
+        
+        # Initialize tracking data for all players, who join at game 1
         for player in players:
-            self.total_winnings[player] = 0
-            self.player_join_game[player] = 1  # Initial players joined at game 1
-            self.player_leave_game[player] = None  # None means still active
-            self.win_counts[player] = 0  # Initialize win count
+            self._player_index(player)
             # Record initial joins
             self.add_event("JOIN", player, "Initial", buy_in)
     
     def add_event(self, event_type: str, player: str, action: str, stack: float):
         """Record a new event in the session"""
         self.events.append((self.date, event_type, player, action, stack))
+        self.last_activity = time.monotonic()
+        
+        # Render the display line now, while the win count matches this event
+        format_line = _EVENT_FORMATS.get(event_type)
+        if format_line:
+            wins = self._wins[self._idx[player]] if event_type == "WIN" else 0
+            self._event_lines.append(format_line(
+                player=player, action=action, stack=stack, wins=wins
+            ))
+    
+    def _player_index(self, player: str) -> int:
+        """Get a player's index in the stats lists, adding them the first time they join"""
+        i = self._idx.get(player)
+        if i is None:
+            i = self._idx[player] = len(self._wins)
+            self._winnings.append(0)
+            self._join_game.append(self.game_count)
+            self._leave_game.append(None)
+            self._wins.append(0)
+            insort(self._sorted_players, player)
+        return i
     
     def add_player(self, player: str) -> Tuple[bool, str]:
         """Add a player to the active session"""
         if player in self.active_players:
             return False, f"❌ {player} is already in the game"
             
-        self.active_players[player] = self.buy_in
-        self.total_winnings[player] = self.total_winnings.get(player, 0)  # Keep old winnings if they had any
-        self.player_join_game[player] = self.game_count  # Track when this player joined
-        self.player_leave_game[player] = None  # Reset leave game if they're rejoining
-        self.win_counts[player] = self.win_counts.get(player, 0)  # Keep old win count if they had any
+        # Returning players keep their old winnings and win count
+        i = self._player_index(player)
+        self.active_players[player] = self._buy_in_cents
+        self._join_game[i] = self.game_count  # Track when this player joined
+        self._leave_game[i] = None  # Reset leave game if they're rejoining
         self.add_event("IN", player, "Joined", self.buy_in)
+        self._stats_changed()
         
-        total_prize = len(self.active_players) * self.buy_in
-        return True, f"✅ {player} joined the game with ${self.buy_in}\n💰 Current prize pool: ${total_prize}"
+        return True, f"✅ {player} joined the game with ${self.buy_in}\n💰 Current prize pool: ${self.prize_pool}"
     
     def remove_player(self, player: str) -> Tuple[bool, str]:
         """Remove a player from the active session"""
         if player not in self.active_players:
             return False, f"❌ {player} is not in the game"
             
-        stack = self.active_players.pop(player)
-        self.player_leave_game[player] = self.game_count  # Track when they left
+        stack = _dollars(self.active_players.pop(player))
+        self._leave_game[self._idx[player]] = self.game_count  # Track when they left
         self.add_event("OUT", player, "Left", stack)
+        self._stats_changed()
         
-        total_prize = len(self.active_players) * self.buy_in
-        return True, f"👋 {player} left the game with ${stack}\n💰 New prize pool: ${total_prize}"
+        return True, f"👋 {player} left the game with ${stack}\n💰 New prize pool: ${self.prize_pool}"
     
     def set_winner(self, winner: str) -> Tuple[bool, str]:
         """Set the winner for the current game and automatically start next game"""
         if winner not in self.active_players:
             return False, f"❌ {winner} is not in the game"
             
-        total_pool = len(self.active_players) * self.buy_in
+        pool_cents = len(self.active_players) * self._buy_in_cents
+        total_pool = _dollars(pool_cents)
         
         # Update winner's total winnings and win count
-        self.total_winnings[winner] = self.total_winnings.get(winner, 0) + total_pool
-        self.win_counts[winner] = self.win_counts.get(winner, 0) + 1
+        i = self._idx[winner]
+        self._winnings[i] += pool_cents
+        self._wins[i] += 1
         
         # Record win event
         self.add_event("WIN", winner, f"Won Game #{self.game_count}", total_pool)
@@ -74,16 +160,16 @@ class GameSession:
         message = [
             f"🏆 {winner} won Game #{self.game_count}!",
             f"💰 Prize pool: ${total_pool}",
-            f"👑 Wins: {self.win_counts[winner]}"
+            f"👑 Wins: {self._wins[i]}"
         ]
         
         # Automatically start next game
         self.game_count += 1
+        self._stats_changed()
         
-        # Reset all players' stacks for next game
-        for player in self.active_players:
-            self.active_players[player] = self.buy_in
-            self.add_event("NEWGAME", player, f"Game #{self.game_count}", self.buy_in)
+        # Reset all players' stacks for next game, recorded as one event for the table
+        self.active_players = dict.fromkeys(self.active_players, self._buy_in_cents)
+        self.add_event("ROUND", "*", f"Game #{self.game_count}", self.buy_in)
         
         message.append(f"\n🎲 Game #{self.game_count} has started automatically!")
         message.append(f"💵 All players reset to ${self.buy_in}")
@@ -91,15 +177,49 @@ class GameSession:
         
         return True, "\n".join(message)
     
+    def _stats_changed(self):
+        """Invalidate cached stats after the session changes"""
+        self._stats_rows = None
+        self.stats_dirty = True
+    
+    @property
+    def prize_pool(self) -> float:
+        """Current prize pool; every active stack is reset to the buy-in each game"""
+        return _dollars(len(self.active_players) * self._buy_in_cents)
+    
+    @property
+    def sorted_players(self) -> List[str]:
+        """All players who have ever been in the session, sorted by name"""
+        return self._sorted_players
+    
+    def get_stats_rows(self) -> List[List]:
+        """Get games played, games won, total buy-in and net P/L per player, in sorted_players order"""
+        if self._stats_rows is None:
+            games_played, games_won, total_buyin, net_pnl = [], [], [], []
+            for player in self._sorted_players:
+                i = self._idx[player]
+                played = self._games_played(i)
+                buyin = self._buy_in_cents * played
+                games_played.append(played)
+                games_won.append(self._wins[i])
+                total_buyin.append(_dollars(buyin))
+                net_pnl.append(_dollars(self._winnings[i] - buyin))
+            self._stats_rows = [games_played, games_won, total_buyin, net_pnl]
+        return self._stats_rows
+    
     def get_player_games_played(self, player: str) -> int:
         """Calculate actual number of games played by a player"""
-        join_game = self.player_join_game.get(player, self.game_count)
-        leave_game = self.player_leave_game.get(player)
+        i = self._idx.get(player)
+        return 0 if i is None else self._games_played(i)
+    
+    def _games_played(self, i: int) -> int:
+        """Calculate games played by the player at index i"""
+        leave_game = self._leave_game[i]
         
         if leave_game is None:  # Player is still active
-            return self.game_count - join_game
+            return self.game_count - self._join_game[i]
         else:  # Player has left
-            return leave_game - join_game
+            return leave_game - self._join_game[i]
     
     def get_player_pnl(self, player: str = None) -> Tuple[bool, str]:
         """Calculate profit/loss for one or all players"""
@@ -109,33 +229,34 @@ class GameSession:
         header = [
             "📊 **Profit/Loss Summary**",
             f"Games played: {self.game_count - 1}",
-            "─" * 30
+            _PNL_DIVIDER
         ]
         
-        # Get all players who have ever been in the game
-        all_players = set(self.player_join_game.keys())
-        
-        for p in all_players:
+        # All players who have ever been in the game, kept sorted as they join
+        for p in self._sorted_players:
             if player and p != player:
                 continue
                 
             # Calculate games played and buy-in based on join/leave times
-            games_played = self.get_player_games_played(p)
-            total_buyin = self.buy_in * games_played
-            winnings = self.total_winnings.get(p, 0)
-            pnl = winnings - total_buyin
-            wins = self.win_counts.get(p, 0)
+            i = self._idx[p]
+            games_played = self._games_played(i)
+            total_buyin = self._buy_in_cents * games_played
+            winnings = self._winnings[i]
+            pnl = _dollars(winnings - total_buyin)
+            wins = self._wins[i]
             
             # Add status indicator for active/inactive players
             status = "🟢" if p in self.active_players else "⭕"
             
-            results.append(f"{status} {p}:")
-            results.append(f"  Games Played: {games_played}")
-            results.append(f"  Games Won: {wins}")
-            results.append(f"  Total Buy-in: ${total_buyin}")
-            results.append(f"  Total Won: ${winnings}")
-            results.append(f"  Net P/L: {'+$' + str(pnl) if pnl > 0 else '-$' + str(abs(pnl)) if pnl < 0 else '$0'}")
-            results.append("─" * 20)
+            results.append(_PNL_PLAYER_FORMAT.format(
+                status=status,
+                player=p,
+                games_played=games_played,
+                wins=wins,
+                total_buyin=_dollars(total_buyin),
+                winnings=_dollars(winnings) if winnings else 0,  # $0 until the player first wins
+                pnl='+$' + str(pnl) if pnl > 0 else '-$' + str(abs(pnl)) if pnl < 0 else '$0'
+            ))
             
         if not results:
             return False, f"❌ Player {player} not found"
@@ -145,15 +266,15 @@ class GameSession:
     def get_final_results(self) -> List[Dict]:
         """Get final results for spreadsheet"""
         results = []
-        for player in set(self.initial_players) | set(self.active_players.keys()):
+        for player in set(self.initial_players).union(self.active_players):
             final_stack = self.active_players.get(player, 0)
-            pnl = final_stack - self.buy_in
+            pnl = final_stack - self._buy_in_cents
             results.append({
                 "Player Name": player,
                 "Buy-in": self.buy_in,
                 "Rebuys": 0,  # For future implementation
-                "Final Stack": final_stack,
-                "Net Profit/Loss": pnl
+                "Final Stack": _dollars(final_stack),
+                "Net Profit/Loss": _dollars(pnl)
             })
         return results
     
@@ -164,7 +285,7 @@ class GameSession:
             "Buy-in Amount": self.buy_in,
             "Initial Players": ", ".join(self.initial_players),
             "Current Game": f"Game #{self.game_count}",
-            "Total Pool": sum(self.active_players.values())
+            "Total Pool": self.prize_pool
         }
     
     def get_tracking_data(self) -> List[Tuple]:
@@ -183,24 +304,9 @@ class GameSession:
             f"Buy-in: ${self.buy_in}",
             f"Current Game: #{self.game_count}",
             f"Active Players: {len(self.active_players)}",
-            f"Prize Pool: ${len(self.active_players) * self.buy_in}",
+            f"Prize Pool: ${self.prize_pool}",
             f"Players: {', '.join(self.active_players.keys())}",
-            "─" * 40
+            _EVENTS_DIVIDER
         ]
         
-        # Format events
-        event_lines = []
-        for date, event_type, player, action, stack in self.events:
-            if event_type == "JOIN":
-                event_lines.append(f"➡️ {player} joined with ${stack}")
-            elif event_type == "IN":
-                event_lines.append(f"✅ {player} bought in with ${stack}")
-            elif event_type == "OUT":
-                event_lines.append(f"❌ {player} left the game")
-            elif event_type == "WIN":
-                wins = self.win_counts.get(player, 0)
-                event_lines.append(f"🏆 {player} {action} with ${stack} (Win #{wins})")
-            elif event_type == "NEWGAME":
-                event_lines.append(f"🎲 {action} started - All players reset to ${stack}")
-                
-        return "\n".join(header + [""] + event_lines) 
\ No newline at end of file
+        return "\n".join(header + [""] + self._event_lines) 
\ No newline at end of file
@@ -1,19 +1,71 @@
 import os
 import re
 import json
-import uuid
+import sys
 import time
+import itertools
+import signal
 import logging
 import requests
-from datetime import datetime
-from typing import Tuple, Optional, Dict, List
+import httplib2
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timedelta
+from typing import Tuple, Optional, Dict, List, Set
 from dotenv import load_dotenv
 from rocketchat_API.rocketchat import RocketChat
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.errors import HttpError
 import websocket
 import threading
+from collections import OrderedDict, defaultdict
+from logging.handlers import MemoryHandler, TimedRotatingFileHandler
+from concurrent.futures import ThreadPoolExecutor
+from sheets_api import RETRY_STATUSES, MAX_ATTEMPTS, error_message, retry_delay, row_data, thread_http
+
+# Queued game rows are written every FLUSH_INTERVAL seconds, or as soon as
+# FLUSH_ROWS of them are waiting
+FLUSH_INTERVAL = 2.0
+FLUSH_ROWS = 20
+
+# Longest wait before retrying a write that failed with a transient error
+MAX_FLUSH_BACKOFF = 60.0
+
+# !po <buy-in> <players-count> <winner>, allowing surrounding whitespace
+PO_COMMAND_RE = re.compile(r'^\s*!po\s+(\d+)\s+(\d+)\s+(\w+)\s*$')
+
+# DDP frames, already encoded, for the handshake sent when the server greets
+# a new connection and the reply to server pings
+CONNECT_FRAME = json.dumps({"msg": "connect", "version": "1", "support": ["1"]}).encode()
+PONG_FRAME = b'{"msg":"pong"}'
+
+# Header row of each daily sheet
+SHEET_HEADERS = ['No.', 'Winner', 'Players', 'Buy-in', 'Total Pool', 'Losers', 'Lost Amount']
+
+# Reply to !po help
+HELP_TEXT = """🎲 *PokerPal Commands* 🎲
+
+!po <buy-in> <players-count> <winner>
+  - Records a poker game result
+  - <buy-in>: Amount each player paid (e.g., 400)
+  - <players-count>: Number of players (e.g., 5)
+  - <winner>: Winner's name (e.g., Tuyen)
+
+Example:
+  !po 400 5 Tuyen
+  → Records: $400 buy-in, 5 players, TUYEN won
+  → Total pool: $2000 (400 × 5)
+
+Other Commands:
+  !ping - Check if bot is alive
+  !po help - Show this help message
+
+Note: Winner names are automatically converted to uppercase."""
+
+# Commands answered with a fixed reply
+STATIC_REPLIES = {
+    '!ping': 'pong',
+    '!po help': HELP_TEXT
+}
 
 class PokerBot:
     def __init__(self):
@@ -22,18 +74,25 @@ class PokerBot:
         # Setup logging first
         self.setup_logging()
         
-        # Initialize Rocket Chat connection
-        self.server_url = os.getenv('ROCKET_CHAT_URL')
-        self.username = os.getenv('ROCKET_CHAT_USER')
-        self.password = os.getenv('ROCKET_CHAT_PASSWORD')
-        self.rocket = RocketChat(
-            self.username,
-            self.password,
-            server_url=self.server_url
-        )
-        
-        # Initialize Google Sheets connection
-        self.sheets_service = self._init_google_sheets()
+        # Initialize Google Sheets connection, with one keep-alive
+        # connection per thread making requests. Loading the client takes
+        # about as long as logging in to Rocket Chat, so do both at once
+        self._http_local = threading.local()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            sheets_future = executor.submit(self._init_google_sheets)
+            
+            # Initialize Rocket Chat connection
+            self.server_url = os.getenv('ROCKET_CHAT_URL')
+            self.username = os.getenv('ROCKET_CHAT_USER')
+            self.password = os.getenv('ROCKET_CHAT_PASSWORD')
+            self.rocket = RocketChat(
+                self.username,
+                self.password,
+                server_url=self.server_url,
+                session=self._rocket_session()
+            )
+            
+            self.sheets_service = sheets_future.result()
         self.spreadsheet_id = os.getenv('GOOGLE_SHEETS_ID')
         if not self.spreadsheet_id:
             raise ValueError("GOOGLE_SHEETS_ID not found in environment variables")
@@ -45,43 +104,100 @@ class PokerBot:
         self.is_subscribed = False
         self.room_id = None
         self.room_name = None
+        self._disconnected = threading.Event()
+        self._send_ids = itertools.count(1)  # IDs of sendMessage calls on this connection
+        
+        # DDP message handlers by message type
+        self._message_handlers = {
+            'ping': self._on_ping,
+            'connected': self._on_connected,
+            'result': self._on_result,
+            'ready': self._on_ready,
+            'changed': self._on_changed
+        }
+        
+        # Today's sheet name, and when (as a timestamp) it stops being today
+        self._today = None
+        self._today_ends = 0.0
+        
+        # Sheet ID per sheet title, read from the spreadsheet on first use,
+        # and daily sheets to create with the next write
+        self._sheet_ids: Optional[Dict[str, int]] = None
+        self._new_sheets: Set[str] = set()
+        
+        # Next game number per daily sheet, read from the sheet on first use
+        self._next_number: Dict[str, int] = {}
+        
+        # Game rows waiting to be written, per sheet, with the confirmation
+        # to send once they are saved
+        self._pending: Dict[str, List[Tuple[list, str]]] = defaultdict(list)
+        self._pending_count = 0
+        self._pending_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        
+        # Commands are handled one at a time, in order, off the WebSocket
+        # thread so a slow Rocket.Chat or Sheets call never delays reading
+        self._command_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='commands')
+        
+        # Messages are posted to the room in order by their own worker, so
+        # commands and game writes don't wait on Rocket.Chat
+        self._send_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rc-send')
+        
+        # Last message sent, so an identical one within a second is skipped
+        self.last_message_time = 0.0
+        self.last_message_content = None
         
-        # Message deduplication
-        self.processed_messages = set()
+        # Message deduplication, remembering the most recently seen IDs
+        self.processed_messages = OrderedDict()
         self.max_processed_messages = 1000  # Prevent memory growth
         
     def setup_logging(self):
         """Setup logging configuration"""
         # Create logs directory if it doesn't exist
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-            
-        # Get current date for log file name
-        current_date = datetime.now().strftime('%Y-%m-%d')
-        log_file = f'logs/chat_log_{current_date}.log'
+        os.makedirs('logs', exist_ok=True)
+        
+        formatter = logging.Formatter('%(asctime)s - %(message)s')
+        
+        # Roll the log file over at midnight, keeping a month of history, and
+        # buffer records in memory so bursts of messages don't write to disk
+        # one record at a time; errors are written out immediately
+        file_handler = TimedRotatingFileHandler(
+            'logs/chat_log.log',
+            when='midnight',
+            backupCount=30,
+            encoding='utf-8'
+        )
+        file_handler.setFormatter(formatter)
+        memory_handler = MemoryHandler(
+            capacity=256,
+            flushLevel=logging.ERROR,
+            target=file_handler
+        )
+        
+        # Only warnings and errors go to the console
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+        stream_handler.setLevel(logging.WARNING)
         
         # Configure logging with minimal format
         logging.basicConfig(
             level=logging.INFO,  # Set to INFO for less verbose logs
-            format='%(asctime)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file),
-                logging.StreamHandler()
-            ]
+            handlers=[memory_handler, stream_handler]
         )
         
         self.logger = logging.getLogger('PokerBot')
         
     def log_message(self, message_data: Dict):
         """Log a chat message with user and content"""
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+            
         try:
-            timestamp = datetime.fromtimestamp(message_data.get('ts', {}).get('$date', 0) / 1000).strftime('%Y-%m-%d %H:%M:%S')
             username = message_data.get('u', {}).get('username', 'unknown')
             message = message_data.get('msg', '')
             room_name = self.room_name or 'unknown'
             
-            log_entry = f"[{room_name}] {username}: {message}"
-            self.logger.info(log_entry)
+            self.logger.info("[%s] %s: %s", room_name, username, message)
             
         except Exception as e:
             self.logger.error(f"Error logging message: {str(e)}")
@@ -90,8 +206,14 @@ class PokerBot:
         """Get list of available rooms"""
         rooms = []
         
+        # List public channels and private groups at the same time
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            channels_future = executor.submit(self.rocket.channels_list)
+            groups_future = executor.submit(self.rocket.groups_list)
+            channels = channels_future.result().json()
+            groups = groups_future.result().json()
+        
         # Get public channels
-        channels = self.rocket.channels_list().json()
         if channels.get('success'):
             for channel in channels.get('channels', []):
                 rooms.append({
@@ -101,7 +223,6 @@ class PokerBot:
                 })
         
         # Get private groups where bot is a member
-        groups = self.rocket.groups_list().json()
         if groups.get('success'):
             for group in groups.get('groups', []):
                 rooms.append({
@@ -119,22 +240,14 @@ class PokerBot:
         if env_room_id:
             self.logger.info(f"Using room ID from environment: {env_room_id}")
             
-            # Try to get room name from channels
-            try:
-                room_info = self.rocket.channels_info(room_id=env_room_id).json()
-                if room_info.get('success'):
-                    room_name = room_info['channel']['name']
-                    self.logger.info(f"Found channel: {room_name}")
-                    return env_room_id, room_name
-            except:
-                pass
-                
-            # Try to get room name from private groups
+            # Get the room name, whether it's a channel or a private group
             try:
-                room_info = self.rocket.groups_info(room_id=env_room_id).json()
+                room_info = self.rocket.rooms_info(room_id=env_room_id).json()
                 if room_info.get('success'):
-                    room_name = room_info['group']['name']
-                    self.logger.info(f"Found private group: {room_name}")
+                    room = room_info['room']
+                    room_name = room['name']
+                    room_type = 'private group' if room.get('t') == 'p' else 'channel'
+                    self.logger.info(f"Found {room_type}: {room_name}")
                     return env_room_id, room_name
             except:
                 pass
@@ -183,20 +296,21 @@ class PokerBot:
     
     def parse_command(self, message: str) -> Optional[Tuple[float, int, str]]:
         """Parse the poker command message"""
-        pattern = r'^!po\s+(\d+)\s+(\d+)\s+(\w+)$'
-        match = re.match(pattern, message.strip())
+        match = PO_COMMAND_RE.match(message)
         
         if not match:
             return None
             
-        buy_in = float(match.group(1))      # Changed variable name to buy_in
-        num_players = int(match.group(2))
-        winner_name = match.group(3)         # Changed variable name to winner_name
+        buy_in, num_players, winner_name = match.groups()
         
-        return buy_in, num_players, winner_name
+        return float(buy_in), int(num_players), winner_name
     
     def _init_google_sheets(self):
         """Initialize Google Sheets API service with service account"""
+        # Imported here, on the thread loading the client, as they are slow to import
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+        
         try:
             # Look for service account file in current directory first
             service_account_file = 'service-account.json'
@@ -214,13 +328,19 @@ class PokerBot:
             self.logger.info(f"Using service account file: {service_account_file}")
             
             # Create credentials
-            credentials = service_account.Credentials.from_service_account_file(
+            self.credentials = service_account.Credentials.from_service_account_file(
                 service_account_file,
                 scopes=['https://www.googleapis.com/auth/spreadsheets']
             )
             
-            # Build and return the service
-            service = build('sheets', 'v4', credentials=credentials)
+            # Build and return the service from the discovery document bundled
+            # with the client instead of fetching it over the network
+            service = build(
+                'sheets', 'v4',
+                http=self.sheets_http(),
+                cache_discovery=False,
+                static_discovery=True
+            )
             self.logger.info("Successfully initialized Google Sheets service")
             return service
             
@@ -228,95 +348,142 @@ class PokerBot:
             self.logger.error(f"Failed to initialize Google Sheets: {str(e)}")
             raise
 
+    def sheets_http(self) -> AuthorizedHttp:
+        """Get this thread's connection to Google"""
+        return thread_http(self._http_local, self.credentials)
+
+    def _rocket_session(self) -> requests.Session:
+        """Create the HTTP session shared by all Rocket.Chat REST calls"""
+        # Enough pooled keep-alive connections for the command worker and
+        # the flusher to post at the same time without reconnecting, retrying
+        # once if the server has closed an idle one
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=1)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _execute(self, request):
+        """Execute a Sheets API request, retrying transient errors with exponential backoff"""
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return request.execute(http=self.sheets_http())
+            except HttpError as e:
+                delay = retry_delay(e, attempt, base=0.5, jitter=0.5)
+                if delay is None:
+                    raise
+                self.logger.warning(f"Sheets API returned {e.resp.status}, retrying in {delay:.2f}s")
+                time.sleep(delay)
+
     def get_or_create_today_sheet(self) -> str:
-        """Get or create today's sheet"""
-        today = datetime.now().strftime('%Y-%m-%d')
+        """Get today's sheet, scheduling it to be created with the next write if it does not exist"""
+        # Format the date once a day
+        if time.time() >= self._today_ends:
+            now = datetime.now()
+            self._today = now.strftime('%Y-%m-%d')
+            self._today_ends = datetime.combine(now.date() + timedelta(days=1), datetime.min.time()).timestamp()
+        today = self._today
         
-        try:
-            # Get spreadsheet to check existing sheets
-            spreadsheet = self.sheets_service.spreadsheets().get(
-                spreadsheetId=self.spreadsheet_id
-            ).execute()
-            
-            # Check if today's sheet exists
-            sheet_exists = any(
-                sheet['properties']['title'] == today 
-                for sheet in spreadsheet.get('sheets', [])
-            )
+        # The flusher drops the sheet IDs after a failed write, so check
+        # again after loading them
+        while True:
+            with self._pending_lock:
+                if self._sheet_ids is not None:
+                    if today not in self._sheet_ids:
+                        self._schedule_sheet(today)
+                        self._new_sheets.add(today)
+                        self._next_number.setdefault(today, 1)
+                    return today
             
-            if not sheet_exists:
-                self.logger.info(f"Creating new sheet for {today}")
+            try:
+                # Get spreadsheet to check existing sheets
+                self._load_sheet_ids()
                 
-                # Create new sheet
-                request = {
-                    'requests': [{
-                        'addSheet': {
-                            'properties': {
-                                'title': today,
-                                'gridProperties': {
-                                    'rowCount': 1000,
-                                    'columnCount': 7  # Increased for new columns
-                                }
-                            }
+            except HttpError as e:
+                self.logger.error(f"Google Sheets API error: {error_message(e)}")
+                raise
+            except Exception as e:
+                self.logger.error(f"Error managing sheet: {str(e)}")
+                raise
+
+    def _load_sheet_ids(self):
+        """Read the ID of every sheet in the spreadsheet, keeping the sheets still waiting to be created"""
+        spreadsheet = self._execute(self.sheets_service.spreadsheets().get(
+            spreadsheetId=self.spreadsheet_id,
+            fields='sheets.properties(title,sheetId)'
+        ))
+        sheet_ids = {
+            sheet['properties']['title']: sheet['properties']['sheetId']
+            for sheet in spreadsheet.get('sheets', [])
+        }
+        with self._pending_lock:
+            if self._sheet_ids is not None:
+                for sheet_name in self._new_sheets:
+                    sheet_ids[sheet_name] = self._sheet_ids[sheet_name]
+            self._sheet_ids = sheet_ids
+
+    def _schedule_sheet(self, sheet_name: str):
+        """Give a daily sheet that doesn't exist yet its ID; the caller holds _pending_lock"""
+        # The sheet is added in the same request as its first games. The
+        # date doubles as the sheet ID so the rows can refer to the sheet
+        # before it exists, counting up if a renamed or copied sheet has it
+        self.logger.info(f"Creating new sheet for {sheet_name}")
+        sheet_id = int(sheet_name.replace('-', ''))
+        used_ids = set(self._sheet_ids.values())
+        while sheet_id in used_ids:
+            sheet_id += 1
+        self._sheet_ids[sheet_name] = sheet_id
+
+    def _add_sheet_requests(self, sheet_name: str, sheet_id: int) -> List[Dict]:
+        """Build the requests adding a daily sheet with its header row"""
+        return [
+            {
+                'addSheet': {
+                    'properties': {
+                        'sheetId': sheet_id,
+                        'title': sheet_name,
+                        'gridProperties': {
+                            'rowCount': 1000,
+                            'columnCount': 7  # Increased for new columns
                         }
-                    }]
-                }
-                
-                self.sheets_service.spreadsheets().batchUpdate(
-                    spreadsheetId=self.spreadsheet_id,
-                    body=request
-                ).execute()
-                
-                # Add headers
-                self.sheets_service.spreadsheets().values().update(
-                    spreadsheetId=self.spreadsheet_id,
-                    range=f'{today}!A1:G1',
-                    valueInputOption='RAW',
-                    body={
-                        'values': [['No.', 'Winner', 'Players', 'Buy-in', 'Total Pool', 'Losers', 'Lost Amount']]
                     }
-                ).execute()
-                
-                self.logger.info(f"Successfully created sheet for {today}")
-            
-        except HttpError as e:
-            error_details = json.loads(e.content.decode('utf-8'))
-            self.logger.error(f"Google Sheets API error: {error_details.get('error', {}).get('message')}")
-            raise
-        except Exception as e:
-            self.logger.error(f"Error managing sheet: {str(e)}")
-            raise
-            
-        return today
+                }
+            },
+            {
+                'updateCells': {
+                    'start': {'sheetId': sheet_id, 'rowIndex': 0, 'columnIndex': 0},
+                    'rows': [row_data(SHEET_HEADERS)],
+                    'fields': 'userEnteredValue'
+                }
+            }
+        ]
 
     def save_game(self, buy_in: float, num_players: int, winner_name: str):
-        """Save game information to Google Sheets"""
+        """Queue game information to be saved to Google Sheets"""
         sheet_name = self.get_or_create_today_sheet()
         
-        try:
-            # Get current row count to determine the next number
-            result = self.sheets_service.spreadsheets().values().get(
-                spreadsheetId=self.spreadsheet_id,
-                range=f'{sheet_name}!A:A'
-            ).execute()
-            
-            # Calculate the next number (excluding header row)
-            next_number = len(result.get('values', [])) if 'values' in result else 1
-            
-            # Calculate total pool
-            total_pool = buy_in * num_players
-            
-            # Format winner name in uppercase
-            winner_name = winner_name.upper()
-            
-            # Append new row
-            result = self.sheets_service.spreadsheets().values().append(
-                spreadsheetId=self.spreadsheet_id,
-                range=f'{sheet_name}!A:G',
-                valueInputOption='RAW',
-                insertDataOption='INSERT_ROWS',
-                body={
-                    'values': [[
+        # Calculate total pool
+        total_pool = buy_in * num_players
+        
+        # Format winner name in uppercase
+        winner_name = winner_name.upper()
+        
+        # Read the current row count once per sheet to determine the next
+        # number, then keep counting locally. The flusher may drop the count
+        # after a failed write, so check again after reading it
+        while True:
+            with self._pending_lock:
+                next_number = self._next_number.get(sheet_name)
+                if next_number is not None:
+                    self._next_number[sheet_name] = next_number + 1
+                    
+                    # The game number keeps identical games in one batch from
+                    # being skipped as duplicate messages
+                    confirmation = (
+                        f"Game #{next_number} recorded: {winner_name} won! 🏆\n"
+                        f"Buy-in: ${buy_in}\nPlayers: {num_players}\nTotal Pool: ${total_pool}"
+                    )
+                    self._pending[sheet_name].append(([
                         next_number,          # No.
                         winner_name,          # Winner
                         num_players,          # Players
@@ -324,81 +491,193 @@ class PokerBot:
                         total_pool,          # Total Pool
                         "",                  # Losers (to be filled manually)
                         ""                   # Lost Amount (to be filled manually)
-                    ]]
-                }
-            ).execute()
+                    ], confirmation))
+                    self._pending_count += 1
+                    if self._pending_count >= FLUSH_ROWS:
+                        self._flush_event.set()
+                    break
+            
+            try:
+                result = self._execute(self.sheets_service.spreadsheets().values().get(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=f'{sheet_name}!A:A',
+                    majorDimension='COLUMNS',
+                    fields='values'
+                ))
+                
+            except HttpError as e:
+                error_msg = f"Error saving to Google Sheets: {error_message(e)}"
+                self.logger.error(error_msg)
+                raise Exception(error_msg)
             
-            self.logger.info(f"Successfully recorded game: Winner {winner_name}, {num_players} players, ${buy_in} buy-in, total pool ${total_pool}")
-            return f"Game recorded: {winner_name} won! 🏆\nBuy-in: ${buy_in}\nPlayers: {num_players}\nTotal Pool: ${total_pool}"
+            # Calculate the next number (excluding header row)
+            values = result.get('values')
+            with self._pending_lock:
+                self._next_number.setdefault(sheet_name, len(values[0]) if values else 1)
+        
+        self.logger.info(f"Queued game #{next_number}: Winner {winner_name}, {num_players} players, ${buy_in} buy-in, total pool ${total_pool}")
+    
+    def _flush_loop(self):
+        """Write queued games to Google Sheets in the background"""
+        failures = 0
+        while True:
+            if failures:
+                # Back off exponentially while Google keeps failing
+                time.sleep(min(MAX_FLUSH_BACKOFF, FLUSH_INTERVAL * 2 ** failures))
+            else:
+                self._flush_event.wait(timeout=FLUSH_INTERVAL)
+            self._flush_event.clear()
+            try:
+                failures = 0 if self.flush_games() else failures + 1
+            except Exception:
+                # Keep the flusher alive; the games are lost, but later ones aren't
+                self.logger.exception("Unexpected error writing queued games")
+                failures = 0
+    
+    def flush_games(self) -> bool:
+        """Write all queued games in one request, creating new daily sheets, and confirm them in the room.
+        Returns False if the games were queued again after a transient error."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, defaultdict(list)
+            self._pending_count = 0
+            new_sheets, self._new_sheets = self._new_sheets & pending.keys(), self._new_sheets - pending.keys()
+            sheet_ids = dict(self._sheet_ids or {})
+        
+        if not pending:
+            return True
+        
+        try:
+            # Sheet IDs are re-read after a failed write, so look up any sheet
+            # with queued games that isn't known, creating it if it's missing
+            if pending.keys() - sheet_ids.keys():
+                sheet_ids = self._resolve_sheets(pending.keys(), new_sheets)
+            
+            requests = []
+            for sheet_name, games in pending.items():
+                if sheet_name in new_sheets:
+                    requests.extend(self._add_sheet_requests(sheet_name, sheet_ids[sheet_name]))
+                requests.append({
+                    'appendCells': {
+                        'sheetId': sheet_ids[sheet_name],
+                        'rows': [row_data(row) for row, _ in games],
+                        'fields': 'userEnteredValue'
+                    }
+                })
             
-        except HttpError as e:
-            error_details = json.loads(e.content.decode('utf-8'))
-            error_msg = f"Error saving to Google Sheets: {error_details.get('error', {}).get('message')}"
-            self.logger.error(error_msg)
-            raise Exception(error_msg)
+            self._execute(self.sheets_service.spreadsheets().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'requests': requests}
+            ))
         except Exception as e:
-            error_msg = f"Error saving game: {str(e)}"
+            if isinstance(e, (OSError, httplib2.HttpLib2Error)) or \
+               isinstance(e, HttpError) and e.resp.status in RETRY_STATUSES:
+                # The batch is applied all or nothing, so put the games back
+                # ahead of any queued since and try again later
+                self.logger.warning(f"Could not save {sum(map(len, pending.values()))} game(s), will retry: {str(e)}")
+                with self._pending_lock:
+                    for sheet_name, games in self._pending.items():
+                        pending.setdefault(sheet_name, []).extend(games)
+                    self._pending = defaultdict(list, pending)
+                    self._pending_count = sum(map(len, pending.values()))
+                    self._new_sheets |= new_sheets
+                return False
+            
+            if isinstance(e, HttpError):
+                error_msg = f"Error saving to Google Sheets: {error_message(e)}"
+            else:
+                error_msg = f"Error saving game: {str(e)}"
             self.logger.error(error_msg)
-            raise Exception(error_msg)
+            
+            # Sheets and numbers may now be out of step with the spreadsheet,
+            # so re-read them. Games queued since hold numbers already, so
+            # their sheets keep counting from those
+            with self._pending_lock:
+                self._sheet_ids = None
+                self._new_sheets.clear()
+                for sheet_name in pending:
+                    if not self._pending.get(sheet_name):
+                        self._next_number.pop(sheet_name, None)
+            self.send_message(f"Error recording game: {error_msg}")
+            return True
+        
+        for sheet_name, games in pending.items():
+            self.logger.info(f"Successfully recorded {len(games)} game(s) in {sheet_name}")
+            for _, confirmation in games:
+                self.send_message(confirmation)
+        return True
+    
+    def _resolve_sheets(self, sheet_names, new_sheets: Set[str]) -> Dict[str, int]:
+        """Reload the sheet IDs, adding any of sheet_names that still need creating to new_sheets"""
+        self._load_sheet_ids()
+        with self._pending_lock:
+            for sheet_name in sheet_names:
+                if sheet_name in self._new_sheets:
+                    # Scheduled since the queue was taken
+                    self._new_sheets.discard(sheet_name)
+                    new_sheets.add(sheet_name)
+                elif sheet_name not in self._sheet_ids:
+                    self._schedule_sheet(sheet_name)
+                    new_sheets.add(sheet_name)
+                    self._next_number.setdefault(sheet_name, 1)
+            return dict(self._sheet_ids)
     
     def process_message(self, message: str) -> Optional[str]:
         """Process incoming message and return response"""
-        self.logger.info(f"Processing message: {message}")
+        self.logger.info("Processing message: %s", message)
+        command = message.strip()
         
-        # Handle ping command
-        if message.strip() == '!ping':
-            return 'pong'
-            
-        # Handle help command
-        if message.strip() == '!po help':
-            return """🎲 *PokerPal Commands* 🎲
-
-!po <buy-in> <players-count> <winner>
-  - Records a poker game result
-  - <buy-in>: Amount each player paid (e.g., 400)
-  - <players-count>: Number of players (e.g., 5)
-  - <winner>: Winner's name (e.g., Tuyen)
-
-Example:
-  !po 400 5 Tuyen
-  → Records: $400 buy-in, 5 players, TUYEN won
-  → Total pool: $2000 (400 × 5)
-
-Other Commands:
-  !ping - Check if bot is alive
-  !po help - Show this help message
-
-Note: Winner names are automatically converted to uppercase."""
+        # Handle ping and help commands
+        reply = STATIC_REPLIES.get(command)
+        if reply:
+            return reply
             
-        # Handle poker command
-        parsed = self.parse_command(message)
+        # Handle poker command, only running the regex on !po messages
+        parsed = self.parse_command(command) if command.startswith('!po') else None
         if not parsed:
             return "❌ Invalid command format. Use '!po help' to see the correct usage."
             
-        # Send immediate acknowledgment
-        self.send_message("Processing your poker command... 🎲")
-            
+        # The game is confirmed once it has been written to the sheet
         buy_in, num_players, winner_name = parsed
         try:
             self.save_game(buy_in, num_players, winner_name)
-            return f"Game recorded: {winner_name} won! 🏆\nBuy-in: ${buy_in}\nPlayers: {num_players}\nTotal Pool: ${buy_in * num_players}"
+            return None
         except Exception as e:
             error_msg = f"Error recording game: {str(e)}"
             self.logger.error(error_msg)
             return error_msg
 
     def send_message(self, message: str):
+        """Queue a message to be sent to the Rocket Chat channel"""
+        self._send_executor.submit(self._post_message, message)
+
+    def _post_message(self, message: str):
         """Send message to Rocket Chat channel"""
         try:
             current_time = time.time()
-            if hasattr(self, 'last_message_time') and \
-               hasattr(self, 'last_message_content') and \
-               current_time - self.last_message_time < 1 and \
+            if current_time - self.last_message_time < 1 and \
                self.last_message_content == message:
                 self.logger.debug("Skipping duplicate message send")
                 return
 
             self.logger.info(f"Attempting to send message: {message}")
+            
+            # Send over the logged-in WebSocket when there is one, and fall
+            # back to the REST API otherwise (e.g. after a disconnect)
+            if self.is_logged_in and self.ws_connected:
+                try:
+                    self.ws.send(json.dumps({
+                        "msg": "method",
+                        "method": "sendMessage",
+                        "id": f"send-{next(self._send_ids)}",
+                        "params": [{"rid": self.room_id, "msg": message}]
+                    }))
+                    self.logger.info("Message sent successfully")
+                    self.last_message_time = current_time
+                    self.last_message_content = message
+                    return
+                except (websocket.WebSocketException, OSError) as e:
+                    self.logger.warning(f"Could not send message over WebSocket, using REST: {str(e)}")
+            
             response = self.rocket.chat_post_message(message, channel=self.room_id)
             
             if response.ok:
@@ -415,17 +694,7 @@ Note: Winner names are automatically converted to uppercase."""
     def send_login(self):
         """Send login request"""
         try:
-            login_msg = {
-                "msg": "method",
-                "method": "login",
-                "id": f"login-{str(uuid.uuid4())}",
-                "params": [{
-                    "user": {"username": self.username},
-                    "password": self.password
-                }]
-            }
-            
-            self.ws.send(json.dumps(login_msg))
+            self.ws.send(self._login_frame)
             
         except Exception as e:
             self.logger.error(f"Login error: {str(e)}")
@@ -433,42 +702,13 @@ Note: Winner names are automatically converted to uppercase."""
     def subscribe_to_room(self):
         """Subscribe to room messages"""
         try:
-            sub_msg = {
-                "msg": "sub",
-                "id": str(uuid.uuid4()),
-                "name": "stream-room-messages",
-                "params": [
-                    self.room_id,
-                    {
-                        "useCollection": False,
-                        "args": [
-                            {"$or": [{"t": {"$exists": False}}, {"t": ""}]},
-                            {"$or": [{"t": "p"}, {"t": "c"}]},
-                            {"roomParticipant": True},
-                            {"roomType": {"$ne": "d"}}
-                        ]
-                    }
-                ]
-            }
-            self.ws.send(json.dumps(sub_msg))
+            self.ws.send(self._sub_frame)
             self.logger.info(f"Sent subscription request for room: {self.room_name} (ID: {self.room_id})")
         except Exception as e:
             self.logger.error(f"Error subscribing to room: {str(e)}")
             # Try simpler subscription without args
             try:
-                simple_sub_msg = {
-                    "msg": "sub",
-                    "id": str(uuid.uuid4()),
-                    "name": "stream-room-messages",
-                    "params": [
-                        self.room_id,
-                        {
-                            "useCollection": False,
-                            "args": []
-                        }
-                    ]
-                }
-                self.ws.send(json.dumps(simple_sub_msg))
+                self.ws.send(self._simple_sub_frame)
                 self.logger.info("Sent simplified subscription request")
             except Exception as e:
                 self.logger.error(f"Error sending simplified subscription: {str(e)}")
@@ -476,85 +716,115 @@ Note: Winner names are automatically converted to uppercase."""
     def on_message(self, ws, message):
         """Handle incoming WebSocket messages"""
         try:
+            # Once subscribed, only room messages, server pings and the results
+            # of sent messages matter, so don't parse anything else
+            if self.is_subscribed and 'stream-room-messages' not in message and \
+               '"ping"' not in message and '"send-' not in message:
+                return
+            
             data = json.loads(message)
             
             # Handle initial connection
             if 'server_id' in data:
-                connect_msg = {
-                    "msg": "connect",
-                    "version": "1",
-                    "support": ["1"]
-                }
-                self.ws.send(json.dumps(connect_msg))
+                self.ws.send(CONNECT_FRAME)
                 self.logger.info("Connected to server")
                 return
                 
             msg_type = data.get('msg')
-            self.logger.debug(f"Received message type: {msg_type}")
+            self.logger.debug("Received message type: %s", msg_type)
             
             # Handle different message types
-            if msg_type == 'connected':
-                self.ws_connected = True
-                self.send_login()
-                
-            elif msg_type == 'result':
-                # Handle login result
-                if data.get('id') and data.get('id').startswith('login-'):
-                    if data.get('result'):
-                        self.logger.info("Login successful")
-                        self.is_logged_in = True
-                        self.subscribe_to_room()
-                    else:
-                        error_data = data.get('error', {})
-                        self.logger.error(f"Login failed: {error_data.get('message', 'Unknown error')}")
-                        self.is_logged_in = False
-                        
-            elif msg_type == 'ready':
-                self.is_subscribed = True
-                self.logger.info("Bot ready in room: " + self.room_name)
-                
-            elif msg_type == 'changed' and data.get('collection') == 'stream-room-messages':
-                if not self.is_logged_in or not self.is_subscribed:
-                    self.logger.warning("Not processing message - not logged in or subscribed")
-                    return
-                    
-                # Extract the message content
-                message_data = data['fields']['args'][0]
-                msg_content = message_data.get('msg', '')
-                msg_id = message_data.get('_id', '')
-                sender_username = message_data.get('u', {}).get('username')
-                
-                self.logger.info(f"Received message - ID: {msg_id}, From: {sender_username}, Content: {msg_content}")
+            handler = self._message_handlers.get(msg_type)
+            if handler:
+                handler(data)
                 
-                # Skip if we've already processed this message
-                if msg_id in self.processed_messages:
-                    self.logger.debug(f"Skipping already processed message: {msg_id}")
-                    return
-                    
-                # Add message ID to processed set
-                self.processed_messages.add(msg_id)
-                
-                # Prevent set from growing too large
-                if len(self.processed_messages) > self.max_processed_messages:
-                    self.processed_messages.clear()
-                
-                # Only process command messages
-                if msg_content.startswith('!'):
-                    self.logger.info(f"Processing command from {sender_username}: {msg_content}")
-                    response = self.process_message(msg_content)
-                    if response:
-                        self.logger.info(f"Sending response: {response}")
-                        self.send_message(response)
-                    else:
-                        self.logger.warning(f"No response generated for command: {msg_content}")
-                else:
-                    self.logger.debug(f"Ignoring non-command message: {msg_content}")
-                        
         except json.JSONDecodeError:
             self.logger.warning(f"Received invalid JSON message: {message}")
         except Exception as e:
             self.logger.error(f"Error processing message: {str(e)}", exc_info=True)
 
+    def _on_ping(self, data: Dict):
+        """Keep the DDP connection alive"""
+        self.ws.send(PONG_FRAME)
+
+    def _on_connected(self, data: Dict):
+        """Log in once the DDP connection is established"""
+        self.ws_connected = True
+        self.send_login()
+
+    def _on_result(self, data: Dict):
+        """Handle login and sent message results"""
+        result_id = data.get('id') or ''
+        if result_id.startswith('login-'):
+            if data.get('result'):
+                self.logger.info("Login successful")
+                self.is_logged_in = True
+                self.subscribe_to_room()
+            else:
+                error_data = data.get('error', {})
+                self.logger.error(f"Login failed: {error_data.get('message', 'Unknown error')}")
+                self.is_logged_in = False
+                
+        # Report messages the server refused to send
+        elif result_id.startswith('send-') and data.get('error'):
+            self.logger.error(f"Failed to send message: {data['error'].get('message', 'Unknown error')}")
+
+    def _on_ready(self, data: Dict):
+        """Mark the room subscription as ready"""
+        self.is_subscribed = True
+        self.logger.info("Bot ready in room: " + self.room_name)
+
+    def _on_changed(self, data: Dict):
+        """Handle a new message in the room"""
+        if data.get('collection') != 'stream-room-messages':
+            return
+            
+        if not self.is_logged_in or not self.is_subscribed:
+            self.logger.warning("Not processing message - not logged in or subscribed")
+            return
+            
+        # Extract the message content
+        message_data = data['fields']['args'][0]
+        msg_content = message_data.get('msg', '')
+        msg_id = message_data.get('_id', '')
+        user = message_data.get('u')
+        sender_username = user.get('username') if user else None
+        
+        self.logger.info("Received message - ID: %s, From: %s, Content: %s", msg_id, sender_username, msg_content)
+        
+        # Only process command messages
+        if not msg_content.startswith('!'):
+            self.logger.debug("Ignoring non-command message: %s", msg_content)
+            return
+        
+        # Skip if we've already processed this command
+        if msg_id in self.processed_messages:
+            self.processed_messages.move_to_end(msg_id)
+            self.logger.debug("Skipping already processed message: %s", msg_id)
+            return
+            
+        # Add message ID to processed messages
+        self.processed_messages[msg_id] = None
+        
+        # Forget the least recently seen command once there are too many
+        if len(self.processed_messages) > self.max_processed_messages:
+            self.processed_messages.popitem(last=False)
+        
+        self.logger.info("Processing command from %s: %s", sender_username, msg_content)
+        self._command_executor.submit(self.handle_command, msg_content)
+
+    def handle_command(self, msg_content: str):
+        """Process a command and send its response"""
+        try:
+            response = self.process_message(msg_content)
+            if response:
+                self.logger.info("Sending response: %s", response)
+                self.send_message(response)
+            else:
+                self.logger.debug("No immediate response for command: %s", msg_content)
+        except Exception as e:
+            self.logger.error(f"Error processing command: {str(e)}", exc_info=True)
+
     def connect_websocket(self):
         """Establish WebSocket connection"""
         websocket_url = f"{self.server_url.replace('http', 'ws')}/websocket"
@@ -562,37 +832,111 @@ Note: Winner names are automatically converted to uppercase."""
         # Disable default websocket trace as we have our own logging
         websocket.enableTrace(False)
         
+        # Serialize and encode the login and subscription requests once. DDP
+        # IDs only have to be unique within a connection, and each is sent once
+        self._login_frame = json.dumps({
+            "msg": "method",
+            "method": "login",
+            "id": "login-1",
+            "params": [{
+                "user": {"username": self.username},
+                "password": self.password
+            }]
+        }).encode()
+        self._sub_frame = json.dumps({
+            "msg": "sub",
+            "id": "sub-1",
+            "name": "stream-room-messages",
+            "params": [
+                self.room_id,
+                {
+                    "useCollection": False,
+                    "args": [
+                        {"$or": [{"t": {"$exists": False}}, {"t": ""}]},
+                        {"$or": [{"t": "p"}, {"t": "c"}]},
+                        {"roomParticipant": True},
+                        {"roomType": {"$ne": "d"}}
+                    ]
+                }
+            ]
+        }).encode()
+        # Simpler subscription without args, if the first one can't be sent
+        self._simple_sub_frame = json.dumps({
+            "msg": "sub",
+            "id": "sub-2",
+            "name": "stream-room-messages",
+            "params": [
+                self.room_id,
+                {
+                    "useCollection": False,
+                    "args": []
+                }
+            ]
+        }).encode()
+        
         self.ws = websocket.WebSocketApp(
             websocket_url,
             on_message=self.on_message
         )
 
+    def warm_up(self):
+        """Get a Google access token and today's sheet before the first command needs them"""
+        try:
+            self.get_or_create_today_sheet()
+        except Exception:
+            pass  # Already logged, and the first command will try again
+
+    def run_websocket(self):
+        """Run the WebSocket connection until it closes"""
+        try:
+            # Let the library ping the server so a dead connection is noticed
+            self.ws.run_forever(ping_interval=20, ping_timeout=10)
+        finally:
+            self.ws_connected = False
+            self._disconnected.set()
+
     def start(self):
         """Start the bot with WebSocket connection"""
         self.logger.info("Bot is starting...")
         
+        # Exit through the cleanup below on SIGTERM too, so queued games are
+        # saved and buffered log records are written
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        
         try:
             # Select room to join
             self.room_id, self.room_name = self.select_room()
             self.logger.info(f"Connecting to room: {self.room_name}")
             
+            # Warm up Google Sheets on the thread that handles commands, which
+            # then keeps the connection open for them
+            self._command_executor.submit(self.warm_up)
+            
             self.connect_websocket()
             
             # Start WebSocket connection in a separate thread
-            ws_thread = threading.Thread(target=self.ws.run_forever)
+            ws_thread = threading.Thread(target=self.run_websocket)
             ws_thread.daemon = True
             ws_thread.start()
             
-            # Keep the main thread running
-            while True:
-                time.sleep(1)
-                if not self.ws_connected:
-                    self.logger.error("WebSocket connection lost. Shutting down...")
-                    break
+            # Write queued games to Google Sheets in the background
+            flush_thread = threading.Thread(target=self._flush_loop)
+            flush_thread.daemon = True
+            flush_thread.start()
+            
+            # Keep the main thread running until the connection closes
+            self._disconnected.wait()
+            self.logger.error("WebSocket connection lost. Shutting down...")
                     
         except KeyboardInterrupt:
             self.logger.info("Bot is shutting down...")
         finally:
+            # Finish commands already received, then save any games still
+            # waiting in the queue
+            self._command_executor.shutdown(wait=True)
+            if not self.flush_games():
+                self.logger.error(f"Shutting down with {self._pending_count} game(s) not saved")
+            self._send_executor.shutdown(wait=True)
             if self.ws:
                 self.ws.close()
 
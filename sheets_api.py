@@ -0,0 +1,50 @@
+import json
+import random
+import threading
+from typing import Any, Dict, Optional, Sequence
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.errors import HttpError
+
+# Sheets API statuses worth retrying, and how many attempts to make in total
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+MAX_ATTEMPTS = 5
+
+def cell_data(value: Any) -> Dict:
+    """Convert a Python value into Sheets CellData"""
+    if value is None or value == "":
+        return {}
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {'userEnteredValue': {'numberValue': value}}
+    return {'userEnteredValue': {'stringValue': str(value)}}
+
+def row_data(row: Sequence) -> Dict:
+    """Convert a list of values into Sheets RowData"""
+    return {'values': [cell_data(value) for value in row]}
+
+def error_message(e: HttpError) -> str:
+    """Get Google's message from an API error, or the error itself if the body isn't the usual JSON"""
+    try:
+        return json.loads(e.content)['error']['message']
+    except (ValueError, KeyError, TypeError):
+        return str(e)
+
+def retry_delay(e: HttpError, attempt: int, base: float, jitter: float) -> Optional[float]:
+    """Seconds to wait before retrying a failed request, or None if it should not be retried"""
+    if e.resp.status not in RETRY_STATUSES or attempt == MAX_ATTEMPTS - 1:
+        return None
+
+    # Back off exponentially with jitter, unless Google says how long to wait
+    try:
+        return float(e.resp.get('retry-after'))
+    except (TypeError, ValueError):
+        return min(60, base * 2 ** attempt + random.random() * jitter)
+
+def thread_http(local: threading.local, credentials) -> AuthorizedHttp:
+    """Get the calling thread's authorized keep-alive connection to Google, creating it on first use"""
+    # httplib2 connections can't be shared between threads, and reusing
+    # one saves a TLS handshake on every request
+    http = getattr(local, 'http', None)
+    if http is None:
+        http = local.http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=30))
+    return http
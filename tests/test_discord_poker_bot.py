@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import types
+import unittest
+
+import discord_poker_bot
+from game_session import GameSession
+
+
+class FakeSheets:
+    """Stands in for the Sheets service, returning (method, kwargs) as the request"""
+    def spreadsheets(self):
+        return self
+
+    def get(self, **kwargs):
+        return ('get', kwargs)
+
+    def batchUpdate(self, **kwargs):
+        return ('batchUpdate', kwargs)
+
+
+class FakeContext:
+    def __init__(self, channel_id: int = 1):
+        self.channel = types.SimpleNamespace(id=channel_id)
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    async def defer(self):
+        pass
+
+
+class SessionSheetTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        bot = types.SimpleNamespace(
+            logger=logging.getLogger('test'),
+            sheets_service=FakeSheets(),
+            spreadsheet_id='spreadsheet',
+            active_sessions={},
+            sheet_titles=None,
+            sheet_titles_lock=asyncio.Lock()
+        )
+        self.cog = discord_poker_bot.Commands(bot)
+        self.cog._execute = self._execute
+        self.batch_updates = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def asyncTearDown(self):
+        self.cog._executor.shutdown(wait=False)
+
+    async def _execute(self, request):
+        method, kwargs = request
+        if method == 'get':
+            return {'sheets': []}
+        self.batch_updates.append(kwargs['body']['requests'])
+        await self.release.wait()
+        return {}
+
+    async def test_command_during_sheet_creation_is_written_once_created(self):
+        ctx = FakeContext()
+        session = GameSession(100.0, ['A', 'B'], date='2024-01-01')
+        
+        # Hold the sheet creation request until the command has run
+        self.release.clear()
+        create = asyncio.create_task(self.cog.create_session_sheet(ctx, session))
+        while not self.batch_updates:
+            await asyncio.sleep(0)
+        session.add_player('C')
+        await self.cog.update_session_sheet(ctx, session)
+        self.assertEqual(len(self.batch_updates), 1)
+        
+        self.release.set()
+        await create
+        await self.cog._flush_write(ctx.channel.id)
+        
+        # The join is written in the follow-up request, without an error
+        self.assertEqual(ctx.sent, [])
+        self.assertEqual(len(self.batch_updates), 2)
+        rows = [r['updateCells'] for r in self.batch_updates[1] if r['updateCells']['start']['rowIndex'] == 11]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(session.tracking_rows_written, 3)
+        self.assertFalse(session.stats_dirty)
+
+    async def test_update_without_a_sheet_reports_an_error(self):
+        ctx = FakeContext()
+        session = GameSession(100.0, ['A'], date='2024-01-01')
+        await self.cog.update_session_sheet(ctx, session)
+        self.assertEqual(len(ctx.sent), 1)
+        self.assertEqual(self.batch_updates, [])
+
+
+    async def test_end_and_win_in_a_channel_run_one_at_a_time(self):
+        ctx = FakeContext()
+        session = GameSession(100.0, ['A', 'B'], date='2024-01-01')
+        session.sheet_name = 'Session_2024-01-01'
+        session.sheet_id = 1
+        self.cog.bot.active_sessions[ctx.channel.id] = session
+        session.add_player('C')
+        self.cog._schedule_write(ctx, session)
+        
+        # Hold the write that ending the session flushes
+        self.release.clear()
+        end = asyncio.create_task(discord_poker_bot.Commands.po_end.callback(self.cog, ctx))
+        while not self.batch_updates:
+            await asyncio.sleep(0)
+        win = asyncio.create_task(discord_poker_bot.Commands.po_win.callback(self.cog, ctx, player='A'))
+        await asyncio.sleep(0.01)
+        self.assertFalse(win.done())
+        
+        self.release.set()
+        await asyncio.gather(end, win)
+        self.assertEqual(session.game_count, 1)
+        self.assertTrue(ctx.sent[-1].startswith("❌ No active game session"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import logging
+import os
+import unittest
+from unittest import mock
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+import poker_bot
+
+
+class FakeRequest:
+    def __init__(self, respond):
+        self._respond = respond
+
+    def execute(self, http=None):
+        return self._respond()
+
+
+class FakeSheets:
+    """Stands in for the Sheets service, keeping the title and ID of each sheet"""
+    def __init__(self, sheets=None):
+        self.sheets = dict(sheets or {})  # title: sheetId
+        self.batch_updates = []  # Requests of each successful batchUpdate
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(self, **kwargs):
+        if 'range' in kwargs:
+            # Only the header row is on the sheet
+            return FakeRequest(lambda: {'values': [['No.']]})
+        return FakeRequest(lambda: {'sheets': [
+            {'properties': {'title': title, 'sheetId': sheet_id}}
+            for title, sheet_id in self.sheets.items()
+        ]})
+
+    def batchUpdate(self, **kwargs):
+        return FakeRequest(lambda: self._batch_update(kwargs['body']['requests']))
+
+    def _batch_update(self, requests):
+        for request in requests:
+            if 'addSheet' in request:
+                properties = request['addSheet']['properties']
+                if properties['sheetId'] in self.sheets.values():
+                    raise http_error(400, "A sheet with this ID already exists")
+                self.sheets[properties['title']] = properties['sheetId']
+        self.batch_updates.append(requests)
+        return {}
+
+
+def http_error(status: int, message: str) -> HttpError:
+    content = ('{"error": {"message": "%s"}}' % message).encode()
+    return HttpError(httplib2.Response({'status': status}), content)
+
+
+def make_bot(sheets: FakeSheets) -> poker_bot.PokerBot:
+    """Create a bot using sheets, with Rocket.Chat mocked out and logging left alone"""
+    def setup_logging(self):
+        self.logger = logging.getLogger('test')
+
+    with mock.patch.object(poker_bot, 'RocketChat'), \
+         mock.patch.object(poker_bot.PokerBot, 'setup_logging', setup_logging), \
+         mock.patch.object(poker_bot.PokerBot, '_init_google_sheets', return_value=sheets), \
+         mock.patch.dict(os.environ, {'GOOGLE_SHEETS_ID': 'spreadsheet'}):
+        bot = poker_bot.PokerBot()
+    bot.sheets_http = lambda: None
+    bot.room_id = 'room'
+    return bot
+
+
+class FlushGamesTest(unittest.TestCase):
+    def setUp(self):
+        self.sheets = FakeSheets()
+        self.bot = make_bot(self.sheets)
+
+    def tearDown(self):
+        self.bot._command_executor.shutdown(wait=True)
+        self.bot._send_executor.shutdown(wait=True)
+
+    def sent_messages(self):
+        self.bot._send_executor.shutdown(wait=True)
+        return [call.args[0] for call in self.bot.rocket.chat_post_message.call_args_list]
+
+    def test_identical_games_are_each_confirmed(self):
+        self.bot.save_game(100, 3, 'minh')
+        self.bot.save_game(100, 3, 'minh')
+        self.assertTrue(self.bot.flush_games())
+
+        confirmations = [m for m in self.sent_messages() if 'recorded' in m]
+        self.assertEqual(len(confirmations), 2)
+        self.assertTrue(confirmations[0].startswith("Game #1 recorded"))
+        self.assertTrue(confirmations[1].startswith("Game #2 recorded"))
+
+    def test_new_sheet_avoids_an_id_already_in_use(self):
+        # A copy of an old daily sheet, renamed, still has that day's ID
+        today = poker_bot.datetime.now().strftime('%Y-%m-%d')
+        today_id = int(today.replace('-', ''))
+        self.sheets.sheets['Copy'] = today_id
+
+        self.bot.save_game(100, 3, 'minh')
+        self.assertTrue(self.bot.flush_games())
+        self.bot.save_game(50, 2, 'tuyen')
+        self.assertTrue(self.bot.flush_games())
+
+        self.assertEqual(len(self.sheets.batch_updates), 2)
+        self.assertNotEqual(self.sheets.sheets[today], today_id)
+        self.assertEqual(len([m for m in self.sent_messages() if 'recorded' in m]), 2)
+
+    def test_failed_write_keeps_numbers_of_games_queued_meanwhile(self):
+        self.bot.save_game(100, 3, 'minh')
+
+        def fail(requests):
+            # Another game is queued while the request is in flight
+            self.bot.save_game(50, 2, 'tuyen')
+            raise http_error(400, "Invalid requests")
+
+        with mock.patch.object(self.sheets, '_batch_update', fail):
+            self.assertTrue(self.bot.flush_games())
+        self.bot.save_game(20, 2, 'cuong')
+        self.assertTrue(self.bot.flush_games())
+
+        numbers = [
+            row['values'][0]['userEnteredValue']['numberValue']
+            for request in self.sheets.batch_updates[-1] if 'appendCells' in request
+            for row in request['appendCells']['rows']
+        ]
+        self.assertEqual(numbers, [2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()